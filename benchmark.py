@@ -0,0 +1,87 @@
+"""
+Memory and allocation time of the domain value objects, compared with equivalent classes
+keeping their attributes in a per-instance __dict__ (as they did before using __slots__).
+Comparison and CoupleValue are interned, so only the time of a creation call is measured for them.
+
+Run with `python benchmark.py`.
+"""
+
+import timeit
+import tracemalloc
+import types
+
+from communication.arguments.Argument import Argument
+from communication.arguments.Comparison import Comparison
+from communication.arguments.CoupleValue import CoupleValue
+from communication.message.Message import Message
+from communication.message.MessagePerformative import MessagePerformative
+from communication.preferences.CriterionName import CriterionName
+from communication.preferences.CriterionValue import CriterionValue
+from communication.preferences.Item import Item
+from communication.preferences.Value import Value
+
+NUMBER_OBJECTS = 100_000
+
+item = Item("A", "A super cool diesel engine", {CriterionName.NOISE: 60})
+constructor_arguments = {
+    Item: ("A", "A super cool diesel engine", {CriterionName.NOISE: 60}),
+    CriterionValue: (item, CriterionName.NOISE, Value.GOOD),
+    Message: (1, 2, MessagePerformative.PROPOSE, item),
+    Argument: (True, item),
+}
+interned_constructor_arguments = {
+    Comparison: (CriterionName.NOISE, CriterionName.CONSUMPTION),
+    CoupleValue: (CriterionName.NOISE, Value.GOOD),
+}
+
+
+def without_slots(cls):
+    """Returns a copy of a slotted class whose instances use a __dict__ instead."""
+    namespace = {
+        name: attribute
+        for name, attribute in vars(cls).items()
+        if name not in ("__slots__", "__dict__", "__weakref__")
+        and not isinstance(attribute, types.MemberDescriptorType)
+    }
+    return type(cls.__name__, cls.__bases__, namespace)
+
+
+def allocation_size(cls, arguments) -> float:
+    """Returns the memory allocated per object, in bytes."""
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    objects = [cls(*arguments) for _ in range(NUMBER_OBJECTS)]
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in end.compare_to(start, "filename"))
+    # the list holding the objects is not part of their size
+    size -= objects.__sizeof__()
+    return size / NUMBER_OBJECTS
+
+
+def allocation_time(cls, arguments) -> float:
+    """Returns the time to create an object, in nanoseconds."""
+    timer = timeit.Timer(lambda: cls(*arguments))
+    return min(timer.repeat(repeat=9, number=NUMBER_OBJECTS)) / NUMBER_OBJECTS * 1e9
+
+
+if __name__ == "__main__":
+    print(
+        f"{'class':<15}|{'bytes (dict)':>13}|{'bytes (slots)':>14}|{'saving':>7}"
+        f"|{'ns (dict)':>10}|{'ns (slots)':>11}|{'saving':>7}"
+    )
+    for cls, arguments in constructor_arguments.items():
+        dict_cls = without_slots(cls)
+        dict_size = allocation_size(dict_cls, arguments)
+        slots_size = allocation_size(cls, arguments)
+        dict_time = allocation_time(dict_cls, arguments)
+        slots_time = allocation_time(cls, arguments)
+        print(
+            f"{cls.__name__:<15}|{dict_size:>13.0f}|{slots_size:>14.0f}"
+            f"|{1 - slots_size / dict_size:>7.0%}"
+            f"|{dict_time:>10.0f}|{slots_time:>11.0f}|{1 - slots_time / dict_time:>7.0%}"
+        )
+    for cls, arguments in interned_constructor_arguments.items():
+        print(
+            f"{cls.__name__:<15}| interned, {allocation_time(cls, arguments):.0f} ns per creation call"
+        )
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from communication.mailbox.Mailbox import Mailbox
+from communication.mailbox.RetentionPolicy import RetentionPolicy
 from communication.message.Message import Message
 from communication.message.MessagePerformative import MessagePerformative
 from communication.message.MessageService import MessageService
@@ -20,17 +21,68 @@ class CommunicatingAgent(Agent):
         message_service: The message service used to send and receive message (MessageService)
     """
 
-    def __init__(self, unique_id, model, name):
-        """Create a new communicating agent."""
+    def __init__(
+        self,
+        unique_id,
+        model,
+        name,
+        message_service=None,
+        retention_policy: RetentionPolicy | None = None,
+        max_read_messages: int | None = None,
+    ):
+        """Create a new communicating agent.
+
+        The message service defaults to the one of the model (returned by its get_message_service
+        method), or else to the default MessageService instance. The agent registers itself to it.
+        The retention policy of the mailbox for read messages (and the number of read messages it
+        keeps with RetentionPolicy.KEEP_LAST) defaults to the mailbox_retention_policy (and
+        mailbox_max_read_messages) attribute of the model, or else to RetentionPolicy.KEEP_ALL.
+        """
         super().__init__(unique_id, model)
         self.__name = name
-        self.__mailbox = Mailbox()
-        self.__messages_service = MessageService.get_instance()
+        if retention_policy is None:
+            retention_policy = getattr(
+                model, "mailbox_retention_policy", RetentionPolicy.KEEP_ALL
+            )
+            max_read_messages = getattr(model, "mailbox_max_read_messages", None)
+        self.__mailbox = Mailbox(retention_policy, max_read_messages)
+        if message_service is None:
+            if hasattr(model, "get_message_service"):
+                message_service = model.get_message_service()
+            else:
+                message_service = MessageService.get_instance()
+        self.__messages_service = message_service
+        if message_service is not None:
+            message_service.register_agent(self)
 
     def step(self):
         """The step methods of the agent called by the scheduler at each time tick."""
         super().step()
 
+    def remove(self):
+        """Remove the agent from the schedule of its model, and make it unreachable through its
+        message service."""
+        self.model.schedule.remove(self)
+        self.__messages_service.unregister_agent(self)
+
+    def has_pending_work(self):
+        """Return whether the agent has to step again even if it receives no message (used by the
+        EventDrivenActivation scheduler). True unless overridden."""
+        return True
+
+    def react(self):
+        """Step after receiving a message (called by the AsyncMessageService object)."""
+        self.step()
+
+    def wake_up(self, agent_id):
+        """Step without new message, the last message sent to the agent agent_id being left
+        unanswered (called by the AsyncMessageService object)."""
+        self.step()
+
+    def get_message_service(self):
+        """Return the message service used by the agent."""
+        return self.__messages_service
+
     def get_name(self):
         """Return the name of the communicating agent."""
         return self.__name
@@ -50,6 +102,10 @@ class CommunicatingAgent(Agent):
             Message(self.unique_id, dest_id, performative, content)
         )
 
+    def has_new_messages(self):
+        """Return whether there are unread messages."""
+        return self.__mailbox.has_new_messages()
+
     def get_new_messages(self):
         """Return all the unread messages."""
         return self.__mailbox.get_new_messages()
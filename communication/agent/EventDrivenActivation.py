@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import heapq
+
+from mesa.time import BaseScheduler
+
+
+class EventDrivenActivation(BaseScheduler):
+    """EventDrivenActivation class.
+    Scheduler which only activates the agents woken up since their last step, in the order they
+    were added.
+
+    An agent is woken up when it is added, by the wake method (which the model calls when a message
+    is delivered to the agent), and after its step if its has_pending_work method returns True.
+    An agent woken up during a step is activated in the same step if it comes after the current
+    agent, and in the next one otherwise, as a BaseScheduler would do. Agents which are not woken
+    up are idle: their steps would do nothing.
+
+    attr:
+        agents_by_id: the agents of the schedule, by id (dict)
+        positions: the position of each agent in the order they were added, by id (dict)
+        next_position: the position of the next added agent (int)
+        awake: the heap of the (position, id) of the agents to activate during the current step
+        awake_ids: the ids of the agents in awake (set)
+        next_awake_ids: the ids of the agents to activate during the next step (set)
+        current_position: the position of the agent being activated (None outside of a step)
+    """
+
+    def __init__(self, model):
+        """Create a new, empty EventDrivenActivation."""
+        super().__init__(model)
+        self.__agents_by_id = {}
+        self.__positions = {}
+        self.__next_position = 0
+        self.__awake = []
+        self.__awake_ids = set()
+        self.__next_awake_ids = set()
+        self.__current_position = None
+
+    def add(self, agent):
+        """Add an agent to the schedule, and wake it up."""
+        super().add(agent)
+        self.__agents_by_id[agent.unique_id] = agent
+        self.__positions[agent.unique_id] = self.__next_position
+        self.__next_position += 1
+        self.wake(agent.unique_id)
+
+    def remove(self, agent):
+        """Remove an agent from the schedule."""
+        super().remove(agent)
+        del self.__agents_by_id[agent.unique_id]
+        del self.__positions[agent.unique_id]
+        self.__next_awake_ids.discard(agent.unique_id)
+
+    def wake(self, agent_id):
+        """Wake up an agent, to be activated during the current step if it comes after the current
+        agent, otherwise during the next one."""
+        position = self.__positions.get(agent_id)
+        if position is None:
+            return
+        if self.__current_position is not None and position > self.__current_position:
+            if agent_id not in self.__awake_ids:
+                self.__awake_ids.add(agent_id)
+                heapq.heappush(self.__awake, (position, agent_id))
+        else:
+            self.__next_awake_ids.add(agent_id)
+
+    def get_awake_count(self) -> int:
+        """Return the number of agents to activate during the next step."""
+        return len(self.__next_awake_ids)
+
+    def step(self):
+        """Execute the step of the woken up agents, in the order they were added."""
+        self.__awake = [
+            (self.__positions[agent_id], agent_id) for agent_id in self.__next_awake_ids
+        ]
+        heapq.heapify(self.__awake)
+        self.__awake_ids = self.__next_awake_ids
+        self.__next_awake_ids = set()
+        while self.__awake:
+            self.__current_position, agent_id = heapq.heappop(self.__awake)
+            agent = self.__agents_by_id.get(agent_id)
+            if agent is None:
+                continue
+            agent.step()
+            if agent.has_pending_work():
+                self.__next_awake_ids.add(agent_id)
+        self.__current_position = None
+        self.__awake_ids = set()
+        self.steps += 1
+        self.time += 1
@@ -8,24 +8,58 @@ class Argument:
     Argument class.
     This class implements an argument used during ann interaction.
 
+    Arguments are immutable once built, so they can be hashed (and used as keys, as by the trace
+    sinks): adding a premiss returns a new argument.
+
     attr:
         boolean_decision
         item
-        comparison_list
-        couple_values_list
+        comparison_list: tuple of the comparison premisses
+        couple_values_list: tuple of the couple value premisses
     """
 
-    def __init__(self, boolean_decision, item):
-        self.boolean_decision = boolean_decision
-        self.item: Item = item
-        self.comparison_list: list[Comparison] = []
-        self.couple_values_list: list[CoupleValue] = []
+    __slots__ = ("boolean_decision", "item", "comparison_list", "couple_values_list")
+
+    def __init__(
+        self,
+        boolean_decision,
+        item,
+        comparison_list: tuple[Comparison, ...] = (),
+        couple_values_list: tuple[CoupleValue, ...] = (),
+    ):
+        object.__setattr__(self, "boolean_decision", boolean_decision)
+        object.__setattr__(self, "item", item)
+        object.__setattr__(self, "comparison_list", tuple(comparison_list))
+        object.__setattr__(self, "couple_values_list", tuple(couple_values_list))
 
-    def add_premiss_comparison(self, comparison: Comparison):
-        self.comparison_list.append(comparison)
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
-    def add_premiss_couple_value(self, couple_value: CoupleValue):
-        self.couple_values_list.append(couple_value)
+    def __reduce__(self):
+        return Argument, (
+            self.boolean_decision,
+            self.item,
+            self.comparison_list,
+            self.couple_values_list,
+        )
+
+    def add_premiss_comparison(self, comparison: Comparison) -> "Argument":
+        """Returns the argument with one more comparison premiss."""
+        return Argument(
+            self.boolean_decision,
+            self.item,
+            self.comparison_list + (comparison,),
+            self.couple_values_list,
+        )
+
+    def add_premiss_couple_value(self, couple_value: CoupleValue) -> "Argument":
+        """Returns the argument with one more couple value premiss."""
+        return Argument(
+            self.boolean_decision,
+            self.item,
+            self.comparison_list,
+            self.couple_values_list + (couple_value,),
+        )
 
     def __str__(self):
         return (
@@ -44,3 +78,13 @@ class Argument:
             and self.comparison_list == other.comparison_list
             and self.couple_values_list == other.couple_values_list
         )
+
+    def __hash__(self) -> int:
+        return hash(
+            (
+                self.boolean_decision,
+                self.item,
+                self.comparison_list,
+                self.couple_values_list,
+            )
+        )
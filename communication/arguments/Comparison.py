@@ -1,28 +1,26 @@
+from communication.arguments.InternedValue import InternedValue
 from communication.preferences.CriterionName import CriterionName
 
 
-class Comparison:
+class Comparison(InternedValue):
     """
     Comparison class.
     This class implements a comparison object used in argument object.
 
+    Comparisons are immutable and interned: creating the same comparison twice returns the same
+    object, so they compare and hash by identity.
+
     attr:
         best_criterion_name
         worst_criterion_name
     """
 
-    def __init__(
-        self, best_criterion_name: CriterionName, worst_criterion_name: CriterionName
+    __slots__ = ("best_criterion_name", "worst_criterion_name")
+
+    def __new__(
+        cls, best_criterion_name: CriterionName, worst_criterion_name: CriterionName
     ):
-        self.best_criterion_name = best_criterion_name
-        self.worst_criterion_name = worst_criterion_name
+        return super().__new__(cls, best_criterion_name, worst_criterion_name)
 
     def __repr__(self) -> str:
         return f"{self.best_criterion_name} > {self.worst_criterion_name}"
-
-    def __eq__(self, other) -> bool:
-        return (
-            isinstance(other, Comparison)
-            and self.best_criterion_name == other.best_criterion_name
-            and self.worst_criterion_name == other.worst_criterion_name
-        )
@@ -1,18 +1,25 @@
+from communication.arguments.InternedValue import InternedValue
 from communication.preferences.CriterionName import CriterionName
 from communication.preferences.Value import Value
 
 
-class CoupleValue:
-    def __init__(self, criterion_name: CriterionName, value: Value):
-        self.criterion_name = criterion_name
-        self.value = value
+class CoupleValue(InternedValue):
+    """
+    CoupleValue class.
+    This class implements a (criterion, value) premise used in argument object.
+
+    Couple values are immutable and interned: creating the same couple twice returns the same
+    object, so they compare and hash by identity.
+
+    attr:
+        criterion_name
+        value
+    """
+
+    __slots__ = ("criterion_name", "value")
+
+    def __new__(cls, criterion_name: CriterionName, value: Value):
+        return super().__new__(cls, criterion_name, value)
 
     def __repr__(self) -> str:
         return f"{self.criterion_name} = {self.value}"
-
-    def __eq__(self, other) -> bool:
-        return (
-            isinstance(other, CoupleValue)
-            and self.criterion_name == other.criterion_name
-            and self.value == other.value
-        )
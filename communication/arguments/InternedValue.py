@@ -0,0 +1,31 @@
+class InternedValue:
+    """
+    InternedValue class.
+    Base class of the immutable value objects used in argument objects, which are interned:
+    creating the same value twice returns the same object, so they compare and hash by identity.
+
+    Subclasses list their fields in __slots__, in the order their constructor takes them.
+    """
+
+    __slots__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # fields -> instance, one table per subclass
+        cls.__instances = {}
+
+    def __new__(cls, *fields):
+        instance = cls.__instances.get(fields)
+        if instance is None:
+            instance = object.__new__(cls)
+            for name, value in zip(cls.__slots__, fields):
+                object.__setattr__(instance, name, value)
+            # setdefault is atomic: concurrent creations all return the first stored instance
+            instance = cls.__instances.setdefault(fields, instance)
+        return instance
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, name) for name in self.__slots__)
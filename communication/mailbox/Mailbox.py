@@ -1,53 +1,145 @@
 #!/usr/bin/env python3
+from collections import defaultdict, deque
+from itertools import islice
+
+from communication.mailbox.RetentionPolicy import RetentionPolicy
 from communication.message.Message import Message
+from communication.message.MessagePerformative import MessagePerformative
 
 
 class Mailbox:
     """Mailbox class.
     Class implementing the mailbox object which manages messages in communicating agents.
 
+    The read messages which are kept depend on the retention policy: all of them, the last
+    max_read_messages ones, or the ones with a terminal performative. The messages which are not
+    kept are forgotten by every get method.
+
     attr:
-        unread_messages: The list of unread messages
+        unread_messages: The queue of unread messages
         read_messages: The list of read messages
+        messages_from_performative: The messages of each performative, in arrival order
+        messages_from_exp: The messages of each sender, in arrival order
+        retention_policy: Which read messages are kept (RetentionPolicy)
+        max_read_messages: The number of read messages kept with RetentionPolicy.KEEP_LAST
+        terminal_performatives: The performatives kept with RetentionPolicy.KEEP_TERMINAL
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        retention_policy: RetentionPolicy = RetentionPolicy.KEEP_ALL,
+        max_read_messages: int | None = None,
+        terminal_performatives=(MessagePerformative.COMMIT, MessagePerformative.ACCEPT),
+    ):
         """Create a new Mailbox."""
-        self.__unread_messages = []
-        self.__read_messages = []
+        if retention_policy == RetentionPolicy.KEEP_LAST and (
+            max_read_messages is None or max_read_messages < 0
+        ):
+            raise ValueError(
+                "KEEP_LAST retention needs a non negative number of read messages to keep"
+            )
+        self.__retention_policy = retention_policy
+        self.__max_read_messages = max_read_messages
+        self.__terminal_performatives = frozenset(terminal_performatives)
+        self.__unread_messages = deque()
+        self.__read_messages = (
+            deque() if retention_policy == RetentionPolicy.KEEP_LAST else []
+        )
+        self.__messages_from_performative = defaultdict(deque)
+        self.__messages_from_exp = defaultdict(deque)
+        # number of unread messages at the end of each index entry
+        self.__unread_count_from_performative = defaultdict(int)
+        self.__unread_count_from_exp = defaultdict(int)
 
     def receive_messages(self, message):
         """Receive a message and add it in the unread messages list."""
         self.__unread_messages.append(message)
+        self.__messages_from_performative[message.get_performative()].append(message)
+        self.__messages_from_exp[message.get_exp()].append(message)
+        self.__unread_count_from_performative[message.get_performative()] += 1
+        self.__unread_count_from_exp[message.get_exp()] += 1
+
+    def has_new_messages(self) -> bool:
+        """Return whether there are unread messages."""
+        return len(self.__unread_messages) > 0
 
     def get_new_messages(self) -> list[Message]:
         """Return all the messages from unread messages list."""
-        unread_messages = self.__unread_messages.copy()
-        if len(unread_messages) > 0:
-            for messages in unread_messages:
-                self.__read_messages.append(messages)
-
+        unread_messages = list(self.__unread_messages)
         self.__unread_messages.clear()
+        if self.__retention_policy == RetentionPolicy.KEEP_ALL:
+            self.__read_messages.extend(unread_messages)
+        elif self.__retention_policy == RetentionPolicy.KEEP_LAST:
+            for message in unread_messages:
+                self.__read_messages.append(message)
+                if len(self.__read_messages) > self.__max_read_messages:
+                    self.__forget_oldest(self.__read_messages.popleft())
+        else:
+            self.__keep_terminal(unread_messages)
+        self.__unread_count_from_performative.clear()
+        self.__unread_count_from_exp.clear()
         return unread_messages
 
+    def __forget_oldest(self, message):
+        """Remove the oldest kept message from the indexes, where it comes first."""
+        for index, key in (
+            (self.__messages_from_performative, message.get_performative()),
+            (self.__messages_from_exp, message.get_exp()),
+        ):
+            index[key].popleft()
+            if not index[key]:
+                del index[key]
+
+    def __keep_terminal(self, unread_messages):
+        """Keep the read messages with a terminal performative and remove the others, which are
+        the unread ones at the end of each index entry, from the indexes."""
+        terminal_performatives = self.__terminal_performatives
+        self.__read_messages.extend(
+            message
+            for message in unread_messages
+            if message.get_performative() in terminal_performatives
+        )
+        for index, unread_counts in (
+            (self.__messages_from_performative, self.__unread_count_from_performative),
+            (self.__messages_from_exp, self.__unread_count_from_exp),
+        ):
+            for key, unread_count in unread_counts.items():
+                messages = index[key]
+                drained_messages = [messages.pop() for _ in range(unread_count)]
+                messages.extend(
+                    message
+                    for message in reversed(drained_messages)
+                    if message.get_performative() in terminal_performatives
+                )
+                if not messages:
+                    del index[key]
+
     def get_messages(self):
         """Return all the messages from both unread and read messages list."""
         if len(self.__unread_messages) > 0:
             self.get_new_messages()
+        if self.__retention_policy == RetentionPolicy.KEEP_LAST:
+            return list(self.__read_messages)
         return self.__read_messages
 
     def get_messages_from_performative(self, performative):
         """Return a list of messages which have the same performative."""
-        messages_from_performative = []
-        for message in self.__unread_messages + self.__read_messages:
-            if message.get_performative() == performative:
-                messages_from_performative.append(message)
-        return messages_from_performative
+        return self.__unread_first(
+            self.__messages_from_performative.get(performative, ()),
+            self.__unread_count_from_performative.get(performative, 0),
+        )
 
     def get_messages_from_exp(self, exp):
         """Return a list of messages which have the same sender."""
-        messages_from_exp = []
-        for message in self.__unread_messages + self.__read_messages:
-            if message.get_exp() == exp:
-                messages_from_exp.append(message)
-        return messages_from_exp
+        return self.__unread_first(
+            self.__messages_from_exp.get(exp, ()),
+            self.__unread_count_from_exp.get(exp, 0),
+        )
+
+    @staticmethod
+    def __unread_first(messages, unread_count) -> list[Message]:
+        """Return the messages of an index entry, the unread ones (at its end) first."""
+        read_count = len(messages) - unread_count
+        return list(islice(messages, read_count, None)) + list(
+            islice(messages, read_count)
+        )
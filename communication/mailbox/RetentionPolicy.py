@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+
+from enum import Enum
+
+
+class RetentionPolicy(Enum):
+    """RetentionPolicy enum class.
+    Enumeration containing the possible policies of a mailbox for its read messages.
+    """
+
+    KEEP_ALL = 0  # keep every read message
+    KEEP_LAST = 1  # keep the last max_read_messages read messages
+    KEEP_TERMINAL = 2  # keep only the read messages with a terminal performative
+
+    def __str__(self):
+        """Returns the name of the enum item."""
+        return "{0}".format(self.name)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import asyncio
+
+from .Message import Message
+from .MessageService import MessageService
+
+
+class AsyncMessageService(MessageService):
+    """AsyncMessageService class.
+    Message service delivering the messages in an asyncio event loop instead of during the steps of
+    the scheduler.
+
+    Each sent message is put, after its latency, in the asyncio queue of its receiver. Each agent
+    waits on its queue: when a message arrives, the agent receives it and reacts (its react method
+    is called, which steps by default). If it sent no message in reaction, the sender of the
+    message is woken up (its wake_up method is called), to step without new message as it would
+    during the next step of the scheduler. The service is quiescent, and run returns, once every
+    sent message and wake-up has been processed. Several services can run concurrently in the same
+    event loop. As there are no steps, the messages are traced with their number in place of a step.
+
+    attr:
+        latency: the delay before the delivery of each message, in seconds (float), or a function
+            returning the delay of a message
+        max_messages: the number of messages after which the next ones are dropped (int or None)
+        queues: the queue of each agent, by id (dict)
+        workers: the task processing the queue of each agent, by id (dict)
+        sent_count: the number of sent messages (int)
+        pending_count: the number of sent messages and wake-ups which have not been processed
+            yet (int)
+        quiescent: the future set once the service is quiescent (asyncio.Future)
+    """
+
+    def __init__(self, scheduler, latency=0.0, trace_sink=None):
+        """Create a new AsyncMessageService object, which becomes the default one."""
+        super().__init__(scheduler, instant_delivery=False, trace_sink=trace_sink)
+        self.__latency = latency
+        self.__max_messages = None
+        self.__queues = {}
+        self.__workers = {}
+        self.__sent_count = 0
+        self.__pending_count = 0
+        self.__quiescent = None
+
+    def get_sent_count(self) -> int:
+        """Return the number of messages sent since the service runs."""
+        return self.__sent_count
+
+    def has_messages_to_proceed(self) -> bool:
+        """Return whether sent messages or wake-ups have not been processed yet."""
+        return self.__pending_count > 0
+
+    def send_message(self, message):
+        """Deliver the message to the queue of its receiver once its latency has passed."""
+        if self.__quiescent is None:
+            raise RuntimeError("AsyncMessageService can only send messages while running")
+        if self.__max_messages is not None and self.__sent_count >= self.__max_messages:
+            return
+        self.get_trace_sink().emit(message, self.__sent_count)
+        self.__sent_count += 1
+        self.__pending_count += 1
+        latency = self.__latency(message) if callable(self.__latency) else self.__latency
+        asyncio.get_running_loop().call_later(latency, self.dispatch_message, message)
+
+    def dispatch_message(self, message):
+        """Put the message in the queue of its receiver."""
+        self.__enqueue(message.get_dest(), message)
+
+    def __enqueue(self, agent_id, message):
+        """Put a message, or the id of an agent to wake the agent up for, in the queue of an agent,
+        starting its worker if needed."""
+        if agent_id not in self.__workers:
+            agent = self.find_agent_from_id(agent_id)
+            if agent is None:
+                self.__fail(KeyError(agent_id))
+                return
+            self.__queues[agent_id] = asyncio.Queue()
+            self.__workers[agent_id] = asyncio.create_task(self.__serve(agent))
+        self.__queues[agent_id].put_nowait(message)
+
+    def dispatch_messages(self):
+        """Nothing to do: the messages are delivered by the event loop."""
+
+    async def __serve(self, agent):
+        """Make the agent receive and react to each message of its queue."""
+        queue = self.__queues[agent.unique_id]
+        try:
+            while True:
+                message = await queue.get()
+                if isinstance(message, Message):
+                    agent.receive_message(message)
+                    for listener in self.get_delivery_listeners():
+                        listener(message)
+                    sent_count = self.__sent_count
+                    agent.react()
+                    if self.__sent_count == sent_count:
+                        self.__wake_up(message.get_exp(), message.get_dest())
+                else:
+                    agent.wake_up(message)
+                self.__pending_count -= 1
+                if self.__pending_count == 0 and not self.__quiescent.done():
+                    self.__quiescent.set_result(None)
+        except Exception as exception:
+            self.__fail(exception)
+
+    def __wake_up(self, agent_id, unanswered_agent_id):
+        """Wake an agent up, whose last message to unanswered_agent_id was left unanswered."""
+        self.__pending_count += 1
+        self.__enqueue(agent_id, unanswered_agent_id)
+
+    def __fail(self, exception):
+        """Stop the service with an exception."""
+        if not self.__quiescent.done():
+            self.__quiescent.set_exception(exception)
+
+    async def run(self, initiations, max_messages=None):
+        """Wake each agent of the (agent, partner id) initiations up for its partner, then deliver
+        the messages until the service is quiescent. Return the number of sent messages."""
+        self.__max_messages = max_messages
+        self.__sent_count = 0
+        self.__pending_count = 0
+        self.__quiescent = asyncio.get_running_loop().create_future()
+        try:
+            for agent, partner_id in initiations:
+                agent.wake_up(partner_id)
+            if self.__pending_count == 0:
+                self.__quiescent.set_result(None)
+            await self.__quiescent
+        finally:
+            for worker in self.__workers.values():
+                worker.cancel()
+            await asyncio.gather(*self.__workers.values(), return_exceptions=True)
+            self.__queues.clear()
+            self.__workers.clear()
+            self.__quiescent = None
+        return self.__sent_count
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+import json
+import os
+
+import numpy as np
+
+from communication.arguments.Argument import Argument
+from communication.preferences.Item import Item
+
+from .Message import Message
+from .MessagePerformative import MessagePerformative
+from .TraceSink import TraceSink
+
+MAGIC = b"ARGTRACE"
+VERSION = 2
+HEADER_DTYPE = np.dtype([("magic", "S8"), ("version", "<u4"), ("record_size", "<u4")])
+RECORD_DTYPE = np.dtype(
+    [
+        ("step", "<u4"),
+        ("sender", "<i4"),
+        ("receiver", "<i4"),
+        ("performative", "u1"),
+        ("content_kind", "u1"),
+        ("content", "<u4"),
+    ]
+)
+PERFORMATIVES = tuple(MessagePerformative)
+
+# kinds of content, the content field of a record being an index in the table of its kind
+NO_CONTENT = 0
+ITEM_CONTENT = 1
+ARGUMENT_CONTENT = 2
+TEXT_CONTENT = 3
+
+
+class BinaryTraceSink(TraceSink):
+    """BinaryTraceSink class.
+    Trace sink which writes each message as a fixed-width record (RECORD_DTYPE) to a binary file,
+    after a header (HEADER_DTYPE). The items, arguments and other contents of the messages are
+    interned into tables, whose entries are appended as JSON lines to the file path + ".jsonl":
+    a first line holds the performatives, and each next one the entries added to the tables since
+    the previous one. The new entries are written before the records referencing them, so that
+    the files can be read as soon as the sink is flushed.
+
+    attr:
+        path: the path of the binary file
+        file: the binary file (opened until the sink is closed)
+        tables_file: the JSON lines file of the tables (opened until the sink is closed)
+        buffer_size: the number of records kept before writing them (int)
+        records: the records not written yet (list)
+        items: the index of each interned item (dict)
+        arguments: the index of each interned argument (dict)
+        texts: the index of each interned text (dict)
+        new_entries: the entries added to the items, arguments and texts tables since they were
+            last written (dict)
+    """
+
+    def __init__(self, path, buffer_size=4096):
+        """Create a new BinaryTraceSink, writing the header of the file and the performatives."""
+        self.__path = path
+        self.__file = open(path, "wb")
+        self.__file.write(
+            np.array((MAGIC, VERSION, RECORD_DTYPE.itemsize), dtype=HEADER_DTYPE).tobytes()
+        )
+        self.__file.flush()
+        self.__tables_file = open(path + ".jsonl", "w")
+        self.__tables_file.write(
+            json.dumps({"performatives": [performative.name for performative in PERFORMATIVES]})
+            + "\n"
+        )
+        self.__tables_file.flush()
+        self.__buffer_size = buffer_size
+        self.__records = []
+        self.__items = {}
+        self.__arguments = {}
+        self.__texts = {}
+        self.__new_entries = {"items": [], "arguments": [], "texts": []}
+        self.__performative_codes = {
+            performative: code for code, performative in enumerate(PERFORMATIVES)
+        }
+
+    def emit(self, message: Message, step: int):
+        """Keep the record of the message, writing the kept records once there are buffer_size of
+        them."""
+        content_kind, content = self.__intern(message.get_content())
+        self.__records.append(
+            (
+                step,
+                message.get_exp(),
+                message.get_dest(),
+                self.__performative_codes[message.get_performative()],
+                content_kind,
+                content,
+            )
+        )
+        if len(self.__records) >= self.__buffer_size:
+            self.__write_records()
+
+    def __intern(self, content):
+        """Return the kind of a content and its index in the table of its kind, adding the content
+        to the table if needed."""
+        if content is None:
+            return NO_CONTENT, 0
+        if isinstance(content, Item):
+            index = self.__items.get(content)
+            if index is None:
+                index = self.__items[content] = len(self.__items)
+                self.__new_entries["items"].append(
+                    {
+                        "name": content.get_name(),
+                        "description": content.get_description(),
+                        "criterion_values": {
+                            criterion_name.name: value
+                            for criterion_name, value in (
+                                content.get_criterion_values() or {}
+                            ).items()
+                        },
+                    }
+                )
+            return ITEM_CONTENT, index
+        if isinstance(content, Argument):
+            index = self.__arguments.get(content)
+            if index is None:
+                _, item_index = self.__intern(content.item)
+                index = self.__arguments[content] = len(self.__arguments)
+                self.__new_entries["arguments"].append(
+                    {
+                        "boolean_decision": content.boolean_decision,
+                        "item": item_index,
+                        "comparisons": [
+                            [
+                                comparison.best_criterion_name.name,
+                                comparison.worst_criterion_name.name,
+                            ]
+                            for comparison in content.comparison_list
+                        ],
+                        "couple_values": [
+                            [couple_value.criterion_name.name, couple_value.value.name]
+                            for couple_value in content.couple_values_list
+                        ],
+                    }
+                )
+            return ARGUMENT_CONTENT, index
+        text = str(content)
+        index = self.__texts.get(text)
+        if index is None:
+            index = self.__texts[text] = len(self.__texts)
+            self.__new_entries["texts"].append(text)
+        return TEXT_CONTENT, index
+
+    def __write_records(self):
+        """Append the new table entries to the JSON lines file, then write the kept records to the
+        file."""
+        if any(self.__new_entries.values()):
+            self.__tables_file.write(json.dumps(self.__new_entries) + "\n")
+            self.__tables_file.flush()
+            self.__new_entries = {"items": [], "arguments": [], "texts": []}
+        if self.__records:
+            self.__file.write(np.array(self.__records, dtype=RECORD_DTYPE).tobytes())
+            self.__records.clear()
+
+    def flush(self):
+        """Write the new table entries and the kept records."""
+        self.__write_records()
+        self.__file.flush()
+
+    def close(self):
+        """Flush the sink and close its files."""
+        self.flush()
+        self.__file.close()
+        self.__tables_file.close()
+
+
+class BinaryTraceReader:
+    """BinaryTraceReader class.
+    Reader of the files written by a BinaryTraceSink, which maps the records into memory.
+
+    attr:
+        records: the records of the messages, as a memory-mapped structured array (RECORD_DTYPE)
+        tables: the performatives, items, arguments and texts referenced by the records (dict)
+    """
+
+    def __init__(self, path):
+        """Map the records of a binary trace into memory and load its tables."""
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if (
+            len(header) == 0
+            or header["magic"][0] != MAGIC
+            or header["version"][0] != VERSION
+            or header["record_size"][0] != RECORD_DTYPE.itemsize
+        ):
+            raise ValueError(f"{path} is not a binary trace of version {VERSION}")
+        if os.path.getsize(path) > HEADER_DTYPE.itemsize:
+            self.__records = np.memmap(
+                path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize
+            )
+        else:
+            self.__records = np.empty(0, dtype=RECORD_DTYPE)
+        self.__tables = {"performatives": [], "items": [], "arguments": [], "texts": []}
+        with open(path + ".jsonl") as tables_file:
+            for line in tables_file:
+                for table, entries in json.loads(line).items():
+                    self.__tables[table].extend(entries)
+
+    def __len__(self):
+        """Return the number of records."""
+        return len(self.__records)
+
+    def get_records(self) -> np.ndarray:
+        """Return the records, whose fields (step, sender, receiver, performative, content_kind
+        and content) can be read as arrays."""
+        return self.__records
+
+    def get_tables(self) -> dict:
+        """Return the tables referenced by the records."""
+        return self.__tables
+
+    def get_performative(self, record) -> MessagePerformative:
+        """Return the performative of a record."""
+        return MessagePerformative[self.__tables["performatives"][record["performative"]]]
+
+    def get_content(self, record):
+        """Return the content of a record: None, or the entry of its item, argument or text."""
+        content_kind = record["content_kind"]
+        if content_kind == NO_CONTENT:
+            return None
+        table = ("items", "arguments", "texts")[content_kind - ITEM_CONTENT]
+        return self.__tables[table][record["content"]]
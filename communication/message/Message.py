@@ -14,6 +14,13 @@ class Message:
         content: the content of the message
     """
 
+    __slots__ = (
+        "__from_agent",
+        "__to_agent",
+        "__message_performative",
+        "__content",
+    )
+
     def __init__(self, from_agent, to_agent, message_performative, content):
         """Create a new message."""
         self.__from_agent: int = from_agent
@@ -24,14 +31,8 @@ class Message:
     def __str__(self) -> str:
         """Return Message as a String."""
         return (
-            "From "
-            + str(self.__from_agent)
-            + " to "
-            + str(self.__to_agent)
-            + " ("
-            + str(self.__message_performative)
-            + ") "
-            + str(self.__content)
+            f"From {self.__from_agent} to {self.__to_agent} "
+            f"({self.__message_performative}) {self.__content}"
         )
 
     def get_exp(self) -> int:
@@ -1,44 +1,89 @@
 #!/usr/bin/env python3
+from .TraceSink import NullTraceSink
 
 
 class MessageService:
     """MessageService class.
     Class implementing the message service used to dispatch messages between communicating agents.
 
-    Not intended to be created more than once: it's a singleton.
+    Each model owns its message service and gives it to its agents. The last created service is
+    also returned by get_instance, for the agents of models which do not give theirs.
 
     attr:
         scheduler: the scheduler of the sma (Scheduler)
         messages_to_proceed: the list of message to proceed mailbox of the agent (list)
+        agents: the agents reachable by id: the agents of the scheduler when the service is
+            created, then the communicating agents created with the service, until they are
+            removed with their remove method (dict)
+        trace_sink: the sink to which each sent message is traced (TraceSink)
+        sent_count: the number of sent messages (int)
+        delivery_listeners: the functions called with each message delivered to an agent (list)
     """
 
     __instance = None
 
     @staticmethod
     def get_instance():
-        """Static access method."""
+        """Static access method: return the default (last created) message service."""
         return MessageService.__instance
 
+    @staticmethod
     def reset():
-        """Reset to do stats !!"""
+        """Forget the default message service."""
         MessageService.__instance = None
 
-    def __init__(self, scheduler, instant_delivery=True):
-        """Create a new MessageService object."""
-        if MessageService.__instance is not None:
-            raise Exception("This class is a singleton!")
-        else:
-            MessageService.__instance = self
-            self.__scheduler = scheduler
-            self.__instant_delivery = instant_delivery
-            self.__messages_to_proceed = []
+    def __init__(self, scheduler, instant_delivery=True, trace_sink=None):
+        """Create a new MessageService object, which becomes the default one.
+        The sent messages are not traced unless a trace sink is given."""
+        MessageService.__instance = self
+        self.__scheduler = scheduler
+        self.__instant_delivery = instant_delivery
+        self.__trace_sink = NullTraceSink() if trace_sink is None else trace_sink
+        self.__messages_to_proceed = []
+        self.__sent_count = 0
+        self.__delivery_listeners = []
+        self.__agents = {agent.unique_id: agent for agent in scheduler.agents}
+
+    def register_agent(self, agent):
+        """Make an agent reachable by its id (called by each new CommunicatingAgent)."""
+        self.__agents[agent.unique_id] = agent
+
+    def unregister_agent(self, agent):
+        """Make an agent unreachable."""
+        self.__agents.pop(agent.unique_id, None)
+
+    def add_delivery_listener(self, listener):
+        """Call listener with each message once it is delivered to its receiver."""
+        self.__delivery_listeners.append(listener)
+
+    def get_delivery_listeners(self):
+        """Return the functions called with each delivered message."""
+        return self.__delivery_listeners
 
     def set_instant_delivery(self, instant_delivery):
         """Set the instant delivery parameter."""
         self.__instant_delivery = instant_delivery
 
+    def get_trace_sink(self):
+        """Return the trace sink of the sent messages."""
+        return self.__trace_sink
+
+    def set_trace_sink(self, trace_sink):
+        """Set the trace sink of the sent messages."""
+        self.__trace_sink = trace_sink
+
+    def flush(self):
+        """Write the sent messages still buffered by the trace sink."""
+        self.__trace_sink.flush()
+
+    def close(self):
+        """Write the sent messages still buffered by the trace sink, and close it."""
+        self.__trace_sink.close()
+
     def send_message(self, message):
         """Dispatch message if instant delivery active, otherwise add the message to proceed list."""
+        self.__trace_sink.emit(message, self.__scheduler.steps)
+        self.__sent_count += 1
         if self.__instant_delivery:
             self.dispatch_message(message)
         else:
@@ -46,18 +91,30 @@ class MessageService:
 
     def dispatch_message(self, message):
         """Dispatch the message to the right agent."""
-        self.find_agent_from_id(message.get_dest()).receive_message(message)
+        self.__agents[message.get_dest()].receive_message(message)
+        for listener in self.__delivery_listeners:
+            listener(message)
 
     def dispatch_messages(self):
         """Proceed each message received by the message service."""
         if len(self.__messages_to_proceed) > 0:
+            agents = self.__agents
+            delivery_listeners = self.__delivery_listeners
             for message in self.__messages_to_proceed:
-                self.dispatch_message(message)
+                agents[message.get_dest()].receive_message(message)
+                for listener in delivery_listeners:
+                    listener(message)
 
         self.__messages_to_proceed.clear()
 
+    def get_sent_count(self) -> int:
+        """Return the number of sent messages."""
+        return self.__sent_count
+
+    def has_messages_to_proceed(self) -> bool:
+        """Return whether sent messages are waiting to be dispatched."""
+        return len(self.__messages_to_proceed) > 0
+
     def find_agent_from_id(self, agent_id):
         """Return the agent according to the agent name given."""
-        for agent in self.__scheduler.agents:
-            if agent.unique_id == agent_id:
-                return agent
+        return self.__agents.get(agent_id)
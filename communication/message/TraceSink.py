@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+import sys
+from abc import ABC, abstractmethod
+
+from .Message import Message
+
+
+class TraceSink(ABC):
+    """TraceSink class.
+    Interface of the objects to which the message service traces the messages it sends.
+    """
+
+    @abstractmethod
+    def emit(self, message: Message, step: int):
+        """Trace a message sent during a step of the scheduler."""
+
+    def flush(self):
+        """Write the traced messages which are still buffered."""
+
+    def close(self):
+        """Write the traced messages which are still buffered, and release the resources of the
+        sink, which must not trace messages any more."""
+        self.flush()
+
+
+class NullTraceSink(TraceSink):
+    """NullTraceSink class.
+    Trace sink which ignores the messages.
+    """
+
+    def emit(self, message: Message, step: int):
+        """Ignore the message."""
+
+
+class ConsoleTraceSink(TraceSink):
+    """ConsoleTraceSink class.
+    Trace sink which prints each message as soon as it is sent.
+    """
+
+    def emit(self, message: Message, step: int):
+        """Print the message."""
+        print(message)
+
+
+class BufferedTextTraceSink(TraceSink):
+    """BufferedTextTraceSink class.
+    Trace sink which keeps the messages and only formats them when writing them to a stream, by
+    batches of buffer_size messages or when flushed.
+
+    attr:
+        stream: the text stream the messages are written to (sys.stdout by default)
+        buffer_size: the number of messages kept before writing them (int)
+        messages: the messages not written yet (list)
+    """
+
+    def __init__(self, stream=None, buffer_size=1024):
+        """Create a new BufferedTextTraceSink."""
+        self.__stream = stream
+        self.__buffer_size = buffer_size
+        self.__messages = []
+
+    def emit(self, message: Message, step: int):
+        """Keep the message, writing the kept messages once there are buffer_size of them."""
+        self.__messages.append(message)
+        if len(self.__messages) >= self.__buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Format the kept messages and write them to the stream."""
+        if self.__messages:
+            stream = sys.stdout if self.__stream is None else self.__stream
+            stream.write("".join(f"{message}\n" for message in self.__messages))
+            self.__messages.clear()
+
+
+class MemoryTraceSink(TraceSink):
+    """MemoryTraceSink class.
+    Trace sink which keeps the messages in memory, without formatting them.
+
+    attr:
+        messages: the traced messages (list)
+    """
+
+    def __init__(self):
+        """Create a new MemoryTraceSink."""
+        self.__messages = []
+
+    def emit(self, message: Message, step: int):
+        """Keep the message."""
+        self.__messages.append(message)
+
+    def get_messages(self) -> list[Message]:
+        """Return the traced messages."""
+        return self.__messages
+
+    def clear(self):
+        """Forget the traced messages."""
+        self.__messages.clear()
@@ -9,6 +9,8 @@ class CriterionValue:
     This class implements the CriterionValue object which associates an item with a CriterionName and a Value.
     """
 
+    __slots__ = ("__item", "__criterion_name", "__value")
+
     def __init__(self, item, criterion_name: CriterionName, value: Value):
         """Creates a new CriterionValue."""
         self.__item = item
@@ -13,6 +13,8 @@ class Item:
         description: the description of the item
     """
 
+    __slots__ = ("__name", "__description", "__criterion_values")
+
     def __init__(self, name, description, criterion_values: Dict[CriterionName, float]):
         """Creates a new Item."""
         self.__name = name
@@ -36,16 +38,8 @@ class Item:
         return preferences.get_value(self, criterion_name)
 
     def get_score(self, preferences):
-        """Returns the score of the Item according to agent preferences."""
-        criterion_weight = 100
-        sum_result = 0
-        for criterion_name in preferences.get_criterion_name_list():
-            sum_result = (
-                sum_result
-                + criterion_weight * self.get_value(preferences, criterion_name).value
-            )
-            criterion_weight = criterion_weight / 2
-        return sum_result
+        """Returns the score of the Item according to agent preferences (cached by the preferences)."""
+        return preferences.get_item_score(self)
 
     def get_criterion_values(self):
         return self.__criterion_values
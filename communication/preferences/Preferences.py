@@ -2,11 +2,20 @@
 
 import random
 
+import numpy as np
+
+from communication.arguments.Comparison import Comparison
+from communication.arguments.CoupleValue import CoupleValue
 from communication.preferences.CriterionName import CriterionName
 from communication.preferences.CriterionValue import CriterionValue
 from communication.preferences.Item import Item
 from communication.preferences.Value import Value
 
+# the columns of the value matrix follow the CriterionName order, its cells hold Value codes
+CRITERIA = tuple(CriterionName)
+VALUES = tuple(Value)
+MISSING_VALUE = -1
+
 
 class Preferences:
     """Preferences class.
@@ -17,55 +26,354 @@ class Preferences:
         criterion_value_list: the list of criterion value
     """
 
-    def __init__(self):
+    def __init__(self, random_generator=random):
         """Creates a new Preferences object.
+        self.__random_generator = random.Random-like object used to break ties between items
         self.__criterion_name_list = preference between the criterions (i.e ecology > price > ... )
-        self.__criterion_value_list = list of triplets (item, criterion, good/bad value)
+        self.__criterion_rank = criterion -> position in the criterion name list
+        self.__criterion_weights = weight of each criterion column in the score (100, 50, 25...)
+        self.__items = the items of the preferences, in the order of the matrix rows
+        self.__values = items x criteria matrix of Value codes (MISSING_VALUE when unknown),
+            rows beyond the number of items are spare capacity
+        self.__criterion_value_list = list of triplets (item, criterion, good/bad value),
+            built from the matrix when asked for
+        self.__scores = score of every item, emptied whenever the preferences change
+        self.__item_rank = position of every item in the item ranking (0 is the preferred item)
+        self.__premisses = (item, supporting) -> couple values supporting or attacking the item
+        self.__counter_premisses = item -> (criterion, opponent value, boolean decision) ->
+            premisses countering an argument about the item, see get_counter_premisses
         """
+        self.__random_generator = random_generator
         self.__criterion_name_list = []
-        self.__criterion_value_list = []
+        self.__criterion_rank = {}
+        self.__criterion_weights = np.zeros(len(CRITERIA))
+        self.__more_important_criteria = {}
+        self.__items = []
+        self.__item_index = {}
+        self.__values = np.full((0, len(CRITERIA)), MISSING_VALUE, dtype=np.int8)
+        self.__criterion_value_list = None
+        self.__sorted_criterion_value_lists = {}
+        self.__scores = None
+        self.__item_ranking = None
+        self.__item_rank = None
+        self.__premisses = {}
+        self.__counter_premisses = {}
+        self.__version = 0
+        self.__score_cache_hits = 0
+        self.__score_cache_misses = 0
+
+    @classmethod
+    def from_value_matrix(
+        cls,
+        item_list: list[Item],
+        value_matrix: np.ndarray,
+        criterion_name_list: list[CriterionName],
+        random_generator=random,
+    ):
+        """Creates Preferences over existing items x criteria Value codes, without copying them.
+        The matrix may be a view into arrays shared with other preferences: it is only written to
+        when values are added for its own items, and copied once more items are added.
+        """
+        preferences = cls(random_generator)
+        preferences.__items = list(item_list)
+        preferences.__item_index = {item: row for row, item in enumerate(item_list)}
+        preferences.__values = value_matrix
+        preferences.set_criterion_name_list(criterion_name_list)
+        return preferences
 
     def get_criterion_name_list(self) -> list[CriterionName]:
         """Returns the list of criterion name."""
         return self.__criterion_name_list
 
     def get_criterion_value_list(self) -> list[CriterionValue]:
-        """Returns the list of criterion value."""
+        """Returns the list of criterion value, item by item.
+        The list is built from the value matrix and cached until the preferences change.
+        """
+        if self.__criterion_value_list is None:
+            self.__criterion_value_list = [
+                CriterionValue(item, CRITERIA[column], VALUES[code])
+                for item, row in zip(self.__items, self.get_value_matrix().tolist())
+                for column, code in enumerate(row)
+                if code != MISSING_VALUE
+            ]
         return self.__criterion_value_list
 
     def get_sorted_criterion_value_list(self, reverse=False) -> list[CriterionValue]:
-        """Returns the sorted list of criterion value, from most to least important."""
-        return sorted(
-            self.__criterion_value_list,
-            key=lambda x: self.__criterion_name_list.index(x.get_criterion_name()),
-            reverse=reverse,
-        )
+        """Returns the sorted list of criterion value, from most to least important.
+        The list is cached until the preferences change and must not be modified.
+        """
+        sorted_list = self.__sorted_criterion_value_lists.get(reverse)
+        if sorted_list is None:
+            sorted_list = sorted(
+                self.get_criterion_value_list(),
+                key=lambda x: self.__criterion_rank[x.get_criterion_name()],
+                reverse=reverse,
+            )
+            self.__sorted_criterion_value_lists[reverse] = sorted_list
+        return sorted_list
+
+    def get_items(self) -> list[Item]:
+        """Returns the items of the preferences, in the order they were added."""
+        return self.__items
+
+    def get_value_matrix(self) -> np.ndarray:
+        """Returns the items x criteria matrix of Value codes (columns follow CriterionName).
+        The matrix must not be modified.
+        """
+        return self.__values[: len(self.__items)]
+
+    def get_criterion_weights(self) -> np.ndarray:
+        """Returns the weight of each criterion column in the item scores."""
+        return self.__criterion_weights
+
+    def get_criterion_rank(self, criterion_name: CriterionName) -> int:
+        """Returns the position of a criterion in the criterion name list (0 is the most important)."""
+        return self.__criterion_rank[criterion_name]
+
+    def get_more_important_criteria(
+        self, criterion_name: CriterionName
+    ) -> tuple[CriterionName, ...]:
+        """Returns the criteria more important than the given one, from the closest to the most important."""
+        criteria = self.__more_important_criteria.get(criterion_name)
+        if criteria is None:
+            rank = self.__criterion_rank[criterion_name]
+            criteria = tuple(self.__criterion_name_list[:rank][::-1])
+            self.__more_important_criteria[criterion_name] = criteria
+        return criteria
 
     def set_criterion_name_list(self, criterion_name_list: list[CriterionName]):
         """Sets the list of criterion name."""
         self.__criterion_name_list = criterion_name_list
+        self.__criterion_rank = {
+            criterion_name: rank
+            for rank, criterion_name in reversed(list(enumerate(criterion_name_list)))
+        }
+        self.__criterion_weights = np.zeros(len(CRITERIA))
+        criterion_weight = 100
+        for criterion_name in criterion_name_list:
+            self.__criterion_weights[criterion_name.value] += criterion_weight
+            criterion_weight = criterion_weight / 2
+        self.__more_important_criteria.clear()
+        self.__sorted_criterion_value_lists.clear()
+        self.__invalidate_scores()
+
+    def add_criterion_value(self, criterion_value: CriterionValue):
+        """Adds a criterion value in the matrix."""
+        row = self.__add_item(criterion_value.get_item())
+        column = criterion_value.get_criterion_name().value
+        # the first value added for a given (item, criterion) is the one that counts
+        if self.__values[row, column] == MISSING_VALUE:
+            self.__values[row, column] = criterion_value.get_value().value
+        self.__invalidate_values()
+
+    def add_criterion_values(
+        self, item_list: list[Item], criterion_name: CriterionName, value_codes
+    ):
+        """Adds the values of a criterion for several items at once, given as Value codes."""
+        rows = np.fromiter(
+            (self.__add_item(item) for item in item_list),
+            dtype=np.intp,
+            count=len(item_list),
+        )
+        column = self.__values[rows, criterion_name.value]
+        # the first value added for a given (item, criterion) is the one that counts
+        self.__values[rows, criterion_name.value] = np.where(
+            column == MISSING_VALUE, value_codes, column
+        )
+        self.__invalidate_values()
 
-    def add_criterion_value(self, criterion_value: list[CriterionValue]):
-        """Adds a criterion value in the list."""
-        self.__criterion_value_list.append(criterion_value)
+    def __add_item(self, item: Item) -> int:
+        """Returns the matrix row of an item, adding the item if needed."""
+        row = self.__item_index.get(item)
+        if row is None:
+            row = len(self.__items)
+            if row == self.__values.shape[0]:
+                values = np.full(
+                    (max(2 * row, 8), len(CRITERIA)), MISSING_VALUE, dtype=np.int8
+                )
+                values[:row] = self.__values
+                self.__values = values
+            self.__items.append(item)
+            self.__item_index[item] = row
+        return row
 
     def get_value(self, item: Item, criterion_name: CriterionName) -> Value | None:
         """Gets the value for a given item and a given criterion name."""
-        for value in self.__criterion_value_list:
-            if (
-                value.get_item() == item
-                and value.get_criterion_name() == criterion_name
-            ):
-                return value.get_value()
-        return None
+        row = self.__item_index.get(item)
+        if row is None:
+            return None
+        code = self.__values[row, criterion_name.value]
+        return None if code == MISSING_VALUE else VALUES[code]
+
+    def __invalidate_values(self):
+        """Drops everything derived from the value matrix."""
+        self.__criterion_value_list = None
+        self.__sorted_criterion_value_lists.clear()
+        self.__invalidate_scores()
+
+    def __invalidate_scores(self):
+        """Drops everything derived from the item scores."""
+        self.__version += 1
+        self.__premisses.clear()
+        self.__counter_premisses.clear()
+        self.__scores = None
+        self.__item_ranking = None
+        self.__item_rank = None
+
+    def get_scores(self) -> np.ndarray:
+        """Returns the score of every item (in the order of get_items): the sum of its values
+        weighted 100, 50, 25... by criterion importance. The array must not be modified.
+        """
+        if self.__scores is None:
+            self.__score_cache_misses += 1
+            self.__scores = (
+                np.maximum(self.get_value_matrix(), 0) @ self.__criterion_weights
+            )
+        else:
+            self.__score_cache_hits += 1
+        return self.__scores
+
+    def get_supporting_premisses(self, item: Item) -> tuple[CoupleValue, ...]:
+        """Returns the GOOD and VERY_GOOD values of an item, from the most to the least important criterion."""
+        return self.__get_premisses(item, True)
+
+    def get_attacking_premisses(self, item: Item) -> tuple[CoupleValue, ...]:
+        """Returns the BAD and VERY_BAD values of an item, from the most to the least important criterion."""
+        return self.__get_premisses(item, False)
+
+    def __get_premisses(self, item: Item, supporting: bool) -> tuple[CoupleValue, ...]:
+        """Returns the premisses table of an item, built once until the preferences change."""
+        premisses = self.__premisses.get((item, supporting))
+        if premisses is None:
+            row = self.__values[self.__item_index[item]].tolist()
+            codes = (
+                (Value.GOOD.value, Value.VERY_GOOD.value)
+                if supporting
+                else (Value.BAD.value, Value.VERY_BAD.value)
+            )
+            premisses = tuple(
+                CoupleValue(criterion_name, VALUES[row[criterion_name.value]])
+                for criterion_name in self.__criterion_name_list
+                if row[criterion_name.value] in codes
+            )
+            self.__premisses[(item, supporting)] = premisses
+        return premisses
+
+    def get_counter_premisses(
+        self,
+        item: Item,
+        criterion_name: CriterionName,
+        value: Value | None,
+        boolean_decision: bool,
+    ) -> tuple[CoupleValue | None, tuple[Comparison, CoupleValue] | None]:
+        """Returns the premisses countering an argument for (boolean_decision True) or against an
+        item which claims that the criterion has the given value:
+        - its own value for the criterion, if it disagrees (BAD or VERY_BAD and worse than the
+        claimed value against an argument for the item, GOOD or VERY_GOOD and better otherwise)
+        - the closest more important criterion whose value is not positive (respectively positive),
+        with the comparison stating it is more important
+        Each is None if there is no such premiss. The lookup table of an item is built once until
+        the preferences change.
+        """
+        counter_premisses = self.__counter_premisses.get(item)
+        if counter_premisses is None:
+            counter_premisses = self.__build_counter_premisses(item)
+            self.__counter_premisses[item] = counter_premisses
+        return counter_premisses.get(
+            (criterion_name, value, boolean_decision), (None, None)
+        )
+
+    def __build_counter_premisses(self, item: Item) -> dict:
+        """Returns the counter premisses of every (criterion, opponent value, boolean decision) for an item."""
+        row = self.__values[self.__item_index[item]].tolist()
+        positive_codes = (Value.GOOD.value, Value.VERY_GOOD.value)
+        counter_premisses = {}
+        for criterion_name in self.__criterion_name_list:
+            own_code = row[criterion_name.value]
+            for boolean_decision in (True, False):
+                importance_counter = None
+                for own_criterion in self.get_more_important_criteria(criterion_name):
+                    code = row[own_criterion.value]
+                    if (code in positive_codes) != boolean_decision:
+                        importance_counter = (
+                            Comparison(own_criterion, criterion_name),
+                            CoupleValue(
+                                own_criterion,
+                                None if code == MISSING_VALUE else VALUES[code],
+                            ),
+                        )
+                        break
+                # the importance counter does not depend on the opponent value
+                counter_premisses[(criterion_name, None, boolean_decision)] = (
+                    None,
+                    importance_counter,
+                )
+                for value in Value:
+                    value_counter = None
+                    if own_code != MISSING_VALUE and (
+                        (
+                            value.value < own_code
+                            and not boolean_decision
+                            and own_code >= Value.GOOD.value
+                        )
+                        or (
+                            value.value > own_code
+                            and boolean_decision
+                            and own_code <= Value.BAD.value
+                        )
+                    ):
+                        value_counter = CoupleValue(criterion_name, VALUES[own_code])
+                    counter_premisses[(criterion_name, value, boolean_decision)] = (
+                        value_counter,
+                        importance_counter,
+                    )
+        return counter_premisses
+
+    def get_item_score(self, item: Item) -> float:
+        """Returns the score of an item: the sum of its values weighted 100, 50, 25... by criterion importance."""
+        return float(self.get_scores()[self.__item_index[item]])
+
+    def __get_rows(self, item_list) -> np.ndarray:
+        """Returns the matrix rows of a list of items."""
+        return np.fromiter(
+            (self.__item_index[item] for item in item_list),
+            dtype=np.intp,
+            count=len(item_list),
+        )
+
+    def get_version(self) -> int:
+        """Returns a number which changes whenever the values or the criterion order change."""
+        return self.__version
+
+    def get_item_ranking(self) -> list[Item]:
+        """Returns the items of the preferences from the most to the least preferred.
+        Equally preferred items keep the order in which they were added.
+        The list is cached until the preferences change and must not be modified.
+        """
+        if self.__item_ranking is None:
+            ranking = np.argsort(-self.get_scores(), kind="stable")
+            self.__item_rank = np.empty(len(ranking), dtype=np.intp)
+            self.__item_rank[ranking] = np.arange(len(ranking))
+            self.__item_ranking = [self.__items[row] for row in ranking.tolist()]
+        return self.__item_ranking
+
+    def get_item_rank(self, item: Item) -> int:
+        """Returns the position of an item in the item ranking (0 is the preferred item)."""
+        if self.__item_rank is None:
+            self.get_item_ranking()
+        return int(self.__item_rank[self.__item_index[item]])
+
+    def get_score_cache_info(self) -> tuple[int, int]:
+        """Returns the (hits, misses) counters of the item score cache."""
+        return self.__score_cache_hits, self.__score_cache_misses
 
     def is_preferred_criterion(self, criterion_name_1, criterion_name_2):
         """Returns if a criterion 1 is preferred to the criterion 2."""
-        for criterion_name in self.__criterion_name_list:
-            if criterion_name == criterion_name_1:
-                return True
-            if criterion_name == criterion_name_2:
-                return False
+        rank_1 = self.__criterion_rank.get(criterion_name_1)
+        rank_2 = self.__criterion_rank.get(criterion_name_2)
+        if rank_1 is None:
+            return None if rank_2 is None else False
+        return rank_2 is None or rank_1 <= rank_2
 
     def is_preferred_item(self, item_1, item_2):
         """Returns True if the item 1 is preferred to the item 2."""
@@ -76,49 +384,55 @@ class Preferences:
         return item_1.get_score(self) >= item_2.get_score(self)
 
     def most_preferred(self, item_list):
-        """Returns the most preferred item from a list."""
+        """Returns the most preferred item from a list, equally preferred items being drawn at random."""
         best_item = item_list[0]
-        for item in item_list[1:]:
-            if self.is_preferred_or_equal_item(item, best_item):
-                if self.is_preferred_or_equal_item(best_item, item):
-                    # both items are equally prefered
-                    best_item = random.choice([best_item, item])
-                else:
-                    best_item = item
+        scores = self.get_scores()[self.__get_rows(item_list)]
+        best_scores = np.maximum.accumulate(scores)
+        # only the items at least as good as every item before them can become the best one
+        for position in (np.flatnonzero(scores[1:] >= best_scores[:-1]) + 1).tolist():
+            if scores[position] > best_scores[position - 1]:
+                best_item = item_list[position]
+            else:
+                # both items are equally prefered
+                best_item = self.__random_generator.choice(
+                    [best_item, item_list[position]]
+                )
         return best_item
 
-    def is_item_among_top_n_percent(self, item, item_list, n=50):
+    def is_item_among_top_n_percent(self, item, item_list=None, n=50):
         """
         Return whether a given item is among the top n percent of the preferred items.
 
+        :param item_list: the items to rank the item against (left untouched), defaults to all the
+        items of the preferences, in which case the maintained item ranking answers in O(1)
         :return: a boolean, True means that the item is among the favourite ones
         """
-        # sort item list in descending order (preferred item will be [0])
-        item_list.sort(key=lambda x: x.get_score(self), reverse=True)
-        item_rank = item_list.index(item)
-        return (item_rank) / len(item_list) < n / 100
+        if item_list is None:
+            item_rank = self.get_item_rank(item)
+            return item_rank / len(self.__items) < n / 100
+        # rank of the item if the list was stably sorted in descending order
+        scores = self.get_scores()[self.__get_rows(item_list)]
+        item_position = item_list.index(item)
+        item_score = scores[item_position]
+        item_rank = np.count_nonzero(scores > item_score) + np.count_nonzero(
+            scores[:item_position] == item_score
+        )
+        return bool(item_rank / len(item_list) < n / 100)
 
     def sort_item_list_by_preference(self, item_list):
         # sort item list in descending order (preferred item will be [0])
-        item_list.sort(key=lambda x: x.get_score(self), reverse=True)
+        scores = self.get_scores()[self.__get_rows(item_list)]
+        item_list[:] = [item_list[i] for i in np.argsort(-scores, kind="stable")]
         return item_list
 
     def __str__(self) -> str:
         result = f'Criterion order : {" > ".join([str(name) for name in self.get_criterion_name_list()])}\nCriterion values :\n'
         criterion_names = [str(name) for name in CriterionName]
-        items = list(
-            set(
-                [
-                    criterion_value.get_item()
-                    for criterion_value in self.get_criterion_value_list()
-                ]
-            )
-        )
+        items = self.get_items()
         first_column_width = max([len(str(item)) for item in items])
         header = " " * first_column_width + "|" + "|".join(criterion_names)
         result += header + "\n"
         stars_columns_width = [max(len(name), 4) for name in criterion_names]
-        rows = [str(item) for item in items]
         star_correspondance = {
             Value.VERY_BAD: "*",
             Value.BAD: "**",
@@ -224,15 +538,15 @@ if __name__ == "__main__":
     )
     print(
         "Diesel Engine in top 10% prefered : {}".format(
-            agent_pref.is_item_among_top_10_percent(
-                diesel_engine, [diesel_engine, electric_engine]
+            agent_pref.is_item_among_top_n_percent(
+                diesel_engine, [diesel_engine, electric_engine], n=10
             )
         )
     )
     print(
         "Electric Engine in top 10% prefered : {}".format(
-            agent_pref.is_item_among_top_10_percent(
-                electric_engine, [diesel_engine, electric_engine]
+            agent_pref.is_item_among_top_n_percent(
+                electric_engine, [diesel_engine, electric_engine], n=10
             )
         )
     )
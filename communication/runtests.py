@@ -3,14 +3,33 @@
 Testing all the functionalities of the communication package.
 """
 
+import asyncio
+import io
+import os
+import pickle
+import tempfile
+
 from mesa import Model
 from mesa.time import RandomActivation
 
 from communication.agent.CommunicatingAgent import CommunicatingAgent
+from communication.agent.EventDrivenActivation import EventDrivenActivation
+from communication.arguments.Argument import Argument
+from communication.arguments.Comparison import Comparison
+from communication.arguments.CoupleValue import CoupleValue
 from communication.mailbox.Mailbox import Mailbox
+from communication.mailbox.RetentionPolicy import RetentionPolicy
 from communication.message.Message import Message
 from communication.message.MessagePerformative import MessagePerformative
+from communication.message.AsyncMessageService import AsyncMessageService
+from communication.message.BinaryTrace import BinaryTraceReader, BinaryTraceSink
 from communication.message.MessageService import MessageService
+from communication.message.TraceSink import BufferedTextTraceSink, MemoryTraceSink
+from communication.preferences.CriterionName import CriterionName
+from communication.preferences.CriterionValue import CriterionValue
+from communication.preferences.Item import Item
+from communication.preferences.Preferences import Preferences
+from communication.preferences.Value import Value
 
 
 class TestAgent(CommunicatingAgent):
@@ -23,6 +42,92 @@ class TestAgent(CommunicatingAgent):
         super().step()
 
 
+class EchoAgent(CommunicatingAgent):
+    """EchoAgent which accepts every proposal it receives, and makes its own proposals when it
+    steps without new message."""
+
+    def __init__(self, unique_id, model, name, proposals=()):
+        super().__init__(unique_id, model, name)
+        self.proposals = list(proposals)
+        self.idle_steps = 0
+
+    def step(self):
+        messages = self.get_new_messages()
+        for message in messages:
+            if message.get_performative() == MessagePerformative.PROPOSE:
+                self.send_message(
+                    Message(
+                        self.unique_id,
+                        message.get_exp(),
+                        MessagePerformative.ACCEPT,
+                        message.get_content(),
+                    )
+                )
+        if len(messages) == 0:
+            self.idle_steps += 1
+            for proposal in self.proposals:
+                self.send_message(
+                    Message(
+                        self.unique_id,
+                        1 - self.unique_id,
+                        MessagePerformative.PROPOSE,
+                        proposal,
+                    )
+                )
+            self.proposals.clear()
+
+
+class AsyncTestModel(Model):
+    """AsyncTestModel which delivers the messages of its EchoAgents in an event loop."""
+
+    def __init__(self, latency):
+        self.schedule = RandomActivation(self)
+        self.__messages_service = AsyncMessageService(self.schedule, latency=latency)
+        self.schedule.add(EchoAgent(0, self, "Agent0", proposals=["A", "B"]))
+        self.schedule.add(EchoAgent(1, self, "Agent1"))
+        self.running = True
+
+    def get_message_service(self):
+        return self.__messages_service
+
+
+class IdleAgent(TestAgent):
+    """IdleAgent which counts its steps and only has work to do when it receives messages."""
+
+    def __init__(self, unique_id, model, name):
+        super().__init__(unique_id, model, name)
+        self.step_count = 0
+
+    def step(self):
+        super().step()
+        self.get_new_messages()
+        self.step_count += 1
+
+    def has_pending_work(self):
+        return False
+
+
+class EventTestModel(Model):
+    """EventTestModel which only activates the agents receiving messages."""
+
+    def __init__(self):
+        self.schedule = EventDrivenActivation(self)
+        self.__messages_service = MessageService(self.schedule)
+        self.__messages_service.add_delivery_listener(
+            lambda message: self.schedule.wake(message.get_dest())
+        )
+        for i in range(3):
+            self.schedule.add(IdleAgent(i, self, "Agent" + str(i)))
+        self.running = True
+
+    def step(self):
+        self.__messages_service.dispatch_messages()
+        self.schedule.step()
+
+    def get_message_service(self):
+        return self.__messages_service
+
+
 class TestModel(Model):
     """TestModel which inherit from Model to test CommunicatingAgent and MessageService."""
 
@@ -38,6 +143,9 @@ class TestModel(Model):
         self.__messages_service.dispatch_messages()
         self.schedule.step()
 
+    def get_message_service(self):
+        return self.__messages_service
+
 
 if __name__ == "__main__":
     print("*---- Testing communication package ----")
@@ -80,14 +188,31 @@ if __name__ == "__main__":
     assert agent1.get_name() == "Agent1"
     print("*     get_name() => OK")
 
+    message_service = MessageService.get_instance()
+    assert message_service.find_agent_from_id(0) is agent0
+    assert message_service.find_agent_from_id(1) is agent1
+    agent2 = TestAgent(2, communicating_model, "Agent2")
+    assert message_service.find_agent_from_id(2) is agent2
+    communicating_model.schedule.add(agent2)
+    agent2.remove()
+    assert agent2 not in communicating_model.schedule.agents
+    assert message_service.find_agent_from_id(2) is None
+    try:
+        agent0.send_message(Message(0, 2, MessagePerformative.COMMIT, "Bonjour"))
+        assert False, "a removed agent must not receive messages"
+    except KeyError:
+        pass
+    assert agent2.get_messages() == []
+    print("*     find_agent_from_id() => OK")
+
     agent0.send_message(
-        Message("Agent0", "Agent1", MessagePerformative.COMMIT, "Bonjour")
+        Message(0, 1, MessagePerformative.COMMIT, "Bonjour")
     )
     agent1.send_message(
-        Message("Agent1", "Agent0", MessagePerformative.COMMIT, "Bonjour")
+        Message(1, 0, MessagePerformative.COMMIT, "Bonjour")
     )
     agent0.send_message(
-        Message("Agent0", "Agent1", MessagePerformative.COMMIT, "Comment ça va ?")
+        Message(0, 1, MessagePerformative.COMMIT, "Comment ça va ?")
     )
 
     assert len(agent0.get_new_messages()) == 1
@@ -99,13 +224,13 @@ if __name__ == "__main__":
     MessageService.get_instance().set_instant_delivery(False)
 
     agent0.send_message(
-        Message("Agent0", "Agent1", MessagePerformative.COMMIT, "Bonjour")
+        Message(0, 1, MessagePerformative.COMMIT, "Bonjour")
     )
     agent1.send_message(
-        Message("Agent1", "Agent0", MessagePerformative.COMMIT, "Bonjour")
+        Message(1, 0, MessagePerformative.COMMIT, "Bonjour")
     )
     agent0.send_message(
-        Message("Agent0", "Agent1", MessagePerformative.COMMIT, "Comment ça va ?")
+        Message(0, 1, MessagePerformative.COMMIT, "Comment ça va ?")
     )
 
     assert len(agent0.get_messages()) == 1
@@ -118,3 +243,274 @@ if __name__ == "__main__":
     assert len(agent0.get_messages()) == 2
     assert len(agent1.get_messages()) == 4
     print("*     send_message() & dispatch_messages => OK")
+
+    print("* 3) Testing several models at once")
+
+    other_model = TestModel()
+    other_agent0 = other_model.schedule.agents[0]
+    assert agent0.get_message_service() is communicating_model.get_message_service()
+    assert other_agent0.get_message_service() is other_model.get_message_service()
+    assert MessageService.get_instance() is other_model.get_message_service()
+
+    agent0.send_message(Message(0, 1, MessagePerformative.COMMIT, "Bonjour"))
+    other_agent0.send_message(Message(0, 1, MessagePerformative.COMMIT, "Bonjour"))
+    assert len(agent1.get_new_messages()) == 0
+    assert len(other_model.schedule.agents[1].get_new_messages()) == 1
+    communicating_model.step()
+    assert len(agent1.get_new_messages()) == 1
+    print("*     one message service per model => OK")
+
+    print("* 4) Testing the retention policies of the mailbox")
+
+    mailbox = Mailbox(RetentionPolicy.KEEP_LAST, 2)
+    for i in range(3):
+        mailbox.receive_messages(Message(i, 0, MessagePerformative.PROPOSE, i))
+    assert len(mailbox.get_messages_from_performative(MessagePerformative.PROPOSE)) == 3
+    assert [m.get_content() for m in mailbox.get_messages()] == [1, 2]
+    assert [m.get_content() for m in mailbox.get_messages_from_performative(MessagePerformative.PROPOSE)] == [1, 2]
+    assert len(mailbox.get_messages_from_exp(0)) == 0
+    mailbox.receive_messages(Message(3, 0, MessagePerformative.COMMIT, 3))
+    assert [m.get_content() for m in mailbox.get_messages_from_performative(MessagePerformative.COMMIT)] == [3]
+    assert [m.get_content() for m in mailbox.get_messages()] == [2, 3]
+    print("*     KEEP_LAST => OK")
+
+    mailbox = Mailbox(RetentionPolicy.KEEP_TERMINAL)
+    mailbox.receive_messages(Message(0, 1, MessagePerformative.PROPOSE, "A"))
+    mailbox.receive_messages(Message(0, 1, MessagePerformative.COMMIT, "A"))
+    mailbox.receive_messages(Message(0, 1, MessagePerformative.ARGUE, "A"))
+    assert len(mailbox.get_messages_from_exp(0)) == 3
+    assert len(mailbox.get_new_messages()) == 3
+    assert [m.get_performative() for m in mailbox.get_messages()] == [MessagePerformative.COMMIT]
+    assert [m.get_performative() for m in mailbox.get_messages_from_exp(0)] == [MessagePerformative.COMMIT]
+    assert len(mailbox.get_messages_from_performative(MessagePerformative.PROPOSE)) == 0
+    print("*     KEEP_TERMINAL => OK")
+
+    class RetentionModel(TestModel):
+        mailbox_retention_policy = RetentionPolicy.KEEP_TERMINAL
+
+    retention_model = RetentionModel()
+    retention_agent0, retention_agent1 = retention_model.schedule.agents
+    retention_agent0.send_message(Message(0, 1, MessagePerformative.PROPOSE, "A"))
+    retention_agent0.send_message(Message(0, 1, MessagePerformative.ACCEPT, "A"))
+    assert len(retention_agent1.get_messages()) == 1
+    print("*     retention policy of the model => OK")
+
+    print("* 5) Testing the trace sinks of the message service")
+
+    memory_sink = MemoryTraceSink()
+    retention_model.get_message_service().set_trace_sink(memory_sink)
+    message = Message(0, 1, MessagePerformative.COMMIT, "A")
+    retention_agent0.send_message(message)
+    assert memory_sink.get_messages() == [message]
+    print("*     MemoryTraceSink => OK")
+
+    stream = io.StringIO()
+    buffered_sink = BufferedTextTraceSink(stream, buffer_size=2)
+    retention_model.get_message_service().set_trace_sink(buffered_sink)
+    retention_agent0.send_message(message)
+    assert stream.getvalue() == ""
+    retention_agent1.send_message(Message(1, 0, MessagePerformative.ACCEPT, "A"))
+    retention_agent0.send_message(message)
+    buffered_sink.flush()
+    assert stream.getvalue() == (
+        "From 0 to 1 (COMMIT) A\nFrom 1 to 0 (ACCEPT) A\nFrom 0 to 1 (COMMIT) A\n"
+    )
+    print("*     BufferedTextTraceSink => OK")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.bin")
+        binary_sink = BinaryTraceSink(path)
+        retention_model.get_message_service().set_trace_sink(binary_sink)
+        retention_agent0.send_message(message)
+        retention_model.step()
+        retention_agent1.send_message(Message(1, 0, MessagePerformative.ACCEPT, None))
+        binary_sink.close()
+        reader = BinaryTraceReader(path)
+        records = reader.get_records()
+        assert len(reader) == 2
+        assert list(records["step"]) == [0, 1]
+        assert list(records["sender"]) == [0, 1]
+        assert reader.get_performative(records[1]) == MessagePerformative.ACCEPT
+        assert reader.get_content(records[0]) == "A"
+        assert reader.get_content(records[1]) is None
+        del records, reader
+
+        item_path = os.path.join(directory, "items.bin")
+        binary_sink = BinaryTraceSink(item_path)
+        retention_model.get_message_service().set_trace_sink(binary_sink)
+        engine = Item("Engine", "An engine without criterion values", None)
+        retention_agent0.send_message(Message(0, 1, MessagePerformative.PROPOSE, engine))
+        binary_sink.close()
+        reader = BinaryTraceReader(item_path)
+        assert reader.get_content(reader.get_records()[0]) == {
+            "name": "Engine",
+            "description": "An engine without criterion values",
+            "criterion_values": {},
+        }
+        del reader
+    print("*     BinaryTraceSink & BinaryTraceReader => OK")
+
+    print("* 6) Testing the asyncio message service")
+
+    async_models = [AsyncTestModel(0.01), AsyncTestModel(lambda message: 0.001)]
+    try:
+        async_models[0].get_message_service().send_message(
+            Message(0, 1, MessagePerformative.PROPOSE, "A")
+        )
+        assert False, "sending outside of run must fail"
+    except RuntimeError:
+        pass
+
+    async def run_dialogues():
+        return await asyncio.gather(
+            *(
+                async_model.get_message_service().run([(async_model.schedule.agents[0], 1)])
+                for async_model in async_models
+            )
+        )
+
+    assert asyncio.run(run_dialogues()) == [4, 4]
+    for async_model in async_models:
+        echo_agent0, echo_agent1 = async_model.schedule.agents
+        assert [m.get_content() for m in echo_agent0.get_messages()] == ["A", "B"]
+        # agent 0 steps once to start, and wakes agent 1 up for each accept, which is not answered
+        assert echo_agent0.idle_steps == 1 and echo_agent1.idle_steps == 2
+    print("*     AsyncMessageService => OK")
+
+    print("* 7) Testing the event driven activation")
+
+    event_model = EventTestModel()
+    idle_agents = event_model.schedule.agents
+    event_model.step()
+    assert [agent.step_count for agent in idle_agents] == [1, 1, 1]
+    event_model.step()
+    assert [agent.step_count for agent in idle_agents] == [1, 1, 1]
+    idle_agents[0].send_message(Message(0, 2, MessagePerformative.PROPOSE, "A"))
+    assert event_model.schedule.get_awake_count() == 1
+    event_model.step()
+    assert [agent.step_count for agent in idle_agents] == [1, 1, 2]
+    print("*     EventDrivenActivation => OK")
+
+    print("* 8) Testing the caches of the preferences")
+
+    preferences = Preferences()
+    preferences.set_criterion_name_list([CriterionName.PRODUCTION_COST, CriterionName.NOISE])
+    item_a = Item("A", "First tied item", None)
+    item_b = Item("B", "Second tied item", None)
+    item_c = Item("C", "Quiet item", None)
+    for item, production_cost, noise in (
+        (item_a, Value.GOOD, Value.BAD),
+        (item_b, Value.GOOD, Value.BAD),
+        (item_c, Value.AVERAGE, Value.VERY_GOOD),
+    ):
+        preferences.add_criterion_value(
+            CriterionValue(item, CriterionName.PRODUCTION_COST, production_cost)
+        )
+        preferences.add_criterion_value(CriterionValue(item, CriterionName.NOISE, noise))
+    # A and B are tied (350), C is preferred (400)
+    assert list(preferences.get_scores()) == [350, 350, 400]
+    assert preferences.get_item_ranking() == [item_c, item_a, item_b]
+    assert preferences.get_counter_premisses(
+        item_a, CriterionName.NOISE, Value.VERY_GOOD, True
+    ) == (CoupleValue(CriterionName.NOISE, Value.BAD), None)
+    print("*     get_scores() & get_item_ranking() & get_counter_premisses() => OK")
+
+    # equally preferred items keep the order of the preferences, or of the given list
+    assert [preferences.get_item_rank(item) for item in (item_a, item_b, item_c)] == [1, 2, 0]
+    assert preferences.sort_item_list_by_preference([item_b, item_a, item_c]) == [
+        item_c,
+        item_b,
+        item_a,
+    ]
+    assert preferences.is_item_among_top_n_percent(item_a)
+    assert not preferences.is_item_among_top_n_percent(item_b)
+    # the results are Python booleans, with or without an item list
+    assert preferences.is_item_among_top_n_percent(item_b, [item_b, item_a, item_c]) is True
+    assert preferences.is_item_among_top_n_percent(item_a, [item_b, item_a, item_c]) is False
+    print("*     order of the equally preferred items => OK")
+
+    version = preferences.get_version()
+    preferences.set_criterion_name_list(
+        [CriterionName.PRODUCTION_COST, CriterionName.DURABILITY]
+    )
+    assert preferences.get_version() > version
+    assert list(preferences.get_scores()) == [300, 300, 200]
+    assert preferences.get_item_ranking() == [item_a, item_b, item_c]
+    assert preferences.get_item_rank(item_c) == 2
+    assert not preferences.is_item_among_top_n_percent(item_c)
+    assert preferences.get_counter_premisses(
+        item_a, CriterionName.NOISE, Value.VERY_GOOD, True
+    ) == (None, None)
+    assert preferences.get_counter_premisses(
+        item_b, CriterionName.DURABILITY, Value.VERY_GOOD, True
+    ) == (None, None)
+    print("*     invalidation by set_criterion_name_list() => OK")
+
+    preferences.add_criterion_value(
+        CriterionValue(item_b, CriterionName.DURABILITY, Value.VERY_BAD)
+    )
+    preferences.add_criterion_value(
+        CriterionValue(item_c, CriterionName.DURABILITY, Value.VERY_GOOD)
+    )
+    assert list(preferences.get_scores()) == [300, 300, 400]
+    assert preferences.get_item_ranking() == [item_c, item_a, item_b]
+    assert preferences.get_item_rank(item_b) == 2
+    assert preferences.is_item_among_top_n_percent(item_c)
+    assert preferences.get_counter_premisses(
+        item_b, CriterionName.DURABILITY, Value.VERY_GOOD, True
+    ) == (CoupleValue(CriterionName.DURABILITY, Value.VERY_BAD), None)
+    print("*     invalidation by add_criterion_value() => OK")
+
+    print("* 9) Testing the arguments")
+
+    argument = Argument(True, item_a)
+    try:
+        argument.item = item_b
+        assert False, "arguments must be immutable"
+    except AttributeError:
+        pass
+    noise_is_good = CoupleValue(CriterionName.NOISE, Value.GOOD)
+    noise_first = Comparison(CriterionName.NOISE, CriterionName.DURABILITY)
+    argument_hash = hash(argument)
+    supported_argument = argument.add_premiss_couple_value(noise_is_good).add_premiss_comparison(
+        noise_first
+    )
+    assert argument.couple_values_list == () and argument.comparison_list == ()
+    assert hash(argument) == argument_hash
+    assert supported_argument == Argument(True, item_a, (noise_first,), (noise_is_good,))
+    print("*     immutable Argument => OK")
+
+    assert CoupleValue(CriterionName.NOISE, Value.GOOD) is noise_is_good
+    assert CoupleValue(CriterionName.NOISE, Value.BAD) is not noise_is_good
+    assert Comparison(CriterionName.NOISE, CriterionName.DURABILITY) is noise_first
+    assert Comparison(CriterionName.DURABILITY, CriterionName.NOISE) is not noise_first
+    try:
+        noise_is_good.value = Value.BAD
+        assert False, "couple values must be immutable"
+    except AttributeError:
+        pass
+    print("*     interned CoupleValue & Comparison => OK")
+
+    same_argument = Argument(
+        True,
+        item_a,
+        [Comparison(CriterionName.NOISE, CriterionName.DURABILITY)],
+        [CoupleValue(CriterionName.NOISE, Value.GOOD)],
+    )
+    assert same_argument == supported_argument and hash(same_argument) == hash(supported_argument)
+    assert same_argument != Argument(False, item_a, (noise_first,), (noise_is_good,))
+    assert same_argument != Argument(True, item_a, (), (noise_is_good,))
+    assert len({argument, supported_argument, same_argument}) == 2
+    print("*     Argument equality & hash => OK")
+
+    assert pickle.loads(pickle.dumps(noise_is_good)) is noise_is_good
+    assert pickle.loads(pickle.dumps(noise_first)) is noise_first
+    # items are compared by identity: the argument is pickled with its item
+    pickled_item, pickled_argument = pickle.loads(pickle.dumps((item_a, supported_argument)))
+    assert pickled_argument.item is pickled_item
+    expected_argument = Argument(True, pickled_item, (noise_first,), (noise_is_good,))
+    assert pickled_argument == expected_argument
+    assert hash(pickled_argument) == hash(expected_argument)
+    assert pickled_argument.couple_values_list[0] is noise_is_good
+    assert pickled_argument.comparison_list[0] is noise_first
+    print("*     pickling of the arguments => OK")
@@ -1,18 +1,23 @@
+import heapq
 import random
+from collections.abc import Mapping
 from enum import Enum
-from typing import Iterable
 
+import numpy as np
 from mesa import Model
 from mesa.time import BaseScheduler, RandomActivation
 
 from communication.agent.CommunicatingAgent import CommunicatingAgent
+from communication.agent.EventDrivenActivation import EventDrivenActivation
 from communication.arguments.Argument import Argument
 from communication.arguments.Comparison import Comparison
 from communication.arguments.CoupleValue import CoupleValue
+from communication.mailbox.RetentionPolicy import RetentionPolicy
 from communication.message.MessagePerformative import MessagePerformative
+from communication.message.AsyncMessageService import AsyncMessageService
 from communication.message.MessageService import MessageService
+from communication.message.TraceSink import ConsoleTraceSink
 from communication.preferences.CriterionName import CriterionName
-from communication.preferences.CriterionValue import CriterionValue
 from communication.preferences.Item import Item
 from communication.preferences.Preferences import Preferences
 from communication.preferences.Value import Value
@@ -30,8 +35,221 @@ class Status(Enum):
     # Si X convainc Y que oui E : item devient ACCEPTABLE_MINIMUM pour X et ARGUMENT_ENDED_WITH_DEFEAT pour Y
 
 
+# an item with one of these statuses can still be agreed on
+NOT_IMPOSSIBLE_STATUSES = (
+    None,
+    Status.PROPOSED,
+    Status.ACCEPTABLE_MINIMUM,
+    Status.ARGUMENT_ENDED_WITH_DEFEAT,
+)
+# an item with one of these statuses can be proposed
+PROPOSABLE_STATUSES = (None, Status.ARGUMENT_ENDED_WITH_DEFEAT)
+
+
+class ItemStatuses(Mapping):
+    """ItemStatuses class.
+    Read-only mapping item -> status (None until the item is discussed), whose statuses are only
+    changed through `statuses[item] = status`.
+
+    The items are also kept in one bucket per status, ordered by the preferences of the agent: each
+    bucket is a heap of item ranks, lazily cleaned of the items whose status changed since. The
+    preferred item with given statuses is thus found without scanning all the items.
+    """
+
+    def __init__(self, statuses: dict[Item, Status | None] | None = None):
+        self.__statuses = dict(statuses or {})
+        self.__buckets = None
+        # the preferences (and their version) the bucket ranks come from
+        self.__ranked_with = None
+
+    def __getitem__(self, item: Item) -> Status | None:
+        return self.__statuses[item]
+
+    def __iter__(self):
+        return iter(self.__statuses)
+
+    def __len__(self) -> int:
+        return len(self.__statuses)
+
+    def __setitem__(self, item: Item, status: Status | None):
+        """Sets the status of an item."""
+        self.__statuses[item] = status
+        # proposing None (no agreement) gives it a status, but it is not a ranked item
+        if self.__buckets is not None and item is not None:
+            heapq.heappush(
+                self.__buckets[status], self.__ranked_with[0].get_item_rank(item)
+            )
+
+    def __update_buckets(self, preferences: Preferences):
+        """Rebuilds the buckets if the preferences changed since they were built."""
+        if self.__ranked_with != (preferences, preferences.get_version()):
+            self.__buckets = {status: [] for status in (None, *Status)}
+            for item, status in self.__statuses.items():
+                if item is not None:
+                    self.__buckets[status].append(preferences.get_item_rank(item))
+            for bucket in self.__buckets.values():
+                heapq.heapify(bucket)
+            self.__ranked_with = (preferences, preferences.get_version())
+
+    def __get_best_rank(self, preferences: Preferences, statuses) -> int | None:
+        """Returns the best rank of the items having one of the statuses, None if there is none."""
+        self.__update_buckets(preferences)
+        ranking = preferences.get_item_ranking()
+        best_rank = None
+        for status in statuses:
+            bucket = self.__buckets[status]
+            while bucket and self.__statuses[ranking[bucket[0]]] != status:
+                heapq.heappop(bucket)
+            if bucket and (best_rank is None or bucket[0] < best_rank):
+                best_rank = bucket[0]
+        return best_rank
+
+    def get_best_score(self, preferences: Preferences, statuses) -> float | None:
+        """Returns the score of the preferred items having one of the statuses, None if there is none."""
+        best_rank = self.__get_best_rank(preferences, statuses)
+        if best_rank is None:
+            return None
+        return preferences.get_item_score(preferences.get_item_ranking()[best_rank])
+
+    def get_best_items(
+        self, preferences: Preferences, statuses, minimum_score: float | None = None
+    ) -> list[Item]:
+        """Returns the (equally) preferred items having one of the statuses, if they are strictly
+        preferred to an item of score minimum_score. Returns an empty list otherwise.
+        """
+        best_rank = self.__get_best_rank(preferences, statuses)
+        if best_rank is None:
+            return []
+        ranking = preferences.get_item_ranking()
+        best_score = preferences.get_item_score(ranking[best_rank])
+        if minimum_score is not None and best_score <= minimum_score:
+            return []
+        # equally preferred items are next to each other in the ranking
+        best_items = []
+        for rank in range(best_rank, len(ranking)):
+            item = ranking[rank]
+            if preferences.get_item_score(item) != best_score:
+                break
+            if item in self.__statuses and self.__statuses[item] in statuses:
+                best_items.append(item)
+        return best_items
+
+
+# Value codes given to a numerical value below p1, in [p1, p2[, in [p2, p3[ and above p3
+LOWER_IS_BETTER_VALUE_CODES = np.array(
+    [Value.VERY_GOOD.value, Value.GOOD.value, Value.BAD.value, Value.VERY_BAD.value],
+    dtype=np.int8,
+)
+HIGHER_IS_BETTER_VALUE_CODES = LOWER_IS_BETTER_VALUE_CODES[::-1].copy()
+
+
+def get_numerical_value_matrix(list_items: list[Item]) -> np.ndarray:
+    """Returns the items x criteria matrix of the numerical criterion values of the items
+    (columns follow CriterionName, NaN when an item has no value for a criterion)."""
+    return np.array(
+        [
+            [
+                item.get_criterion_values().get(criterion_name, np.nan)
+                for criterion_name in CriterionName
+            ]
+            for item in list_items
+        ],
+        dtype=float,
+    ).reshape(len(list_items), len(CriterionName))
+
+
+def rate_numerical_values(
+    numerical_values: np.ndarray, thresholds, criterion_name: CriterionName
+) -> np.ndarray:
+    """Returns the Value codes of numerical values of a criterion, given the three sorted thresholds
+    p1 <= p2 <= p3 splitting them into VERY_GOOD, GOOD, BAD and VERY_BAD (or the reverse)."""
+    value_codes = (
+        LOWER_IS_BETTER_VALUE_CODES
+        if criterion_name.lower_is_better
+        else HIGHER_IS_BETTER_VALUE_CODES
+    )
+    return value_codes[np.searchsorted(thresholds, numerical_values, side="right")]
+
+
+def generate_population_preferences(
+    list_items: list[Item], number_agents: int, seed=None, random_generator=random
+) -> list[Preferences]:
+    """Draws random preferences for a whole population of agents at once.
+
+    The criterion orders and the threshold triples of every agent are drawn as arrays from a
+    NumPy generator seeded with `seed`, and the items of every agent are rated (as by
+    generate_preferences) into a single agents x items x criteria array, each Preferences being a
+    view into it.
+    :param random_generator: the generator used by the preferences to break ties between items
+    """
+    generator = np.random.default_rng(seed)
+    number_criteria = len(CriterionName)
+    criterion_orders = generator.random((number_agents, number_criteria)).argsort(axis=1)
+    criterion_ranges = np.array(
+        [criterion_name.criterion_range for criterion_name in CriterionName], dtype=float
+    )
+    thresholds = np.sort(generator.random((number_agents, number_criteria, 3)), axis=2)
+    thresholds = (
+        thresholds * (criterion_ranges[:, 1] - criterion_ranges[:, 0])[:, np.newaxis]
+        + criterion_ranges[:, 0, np.newaxis]
+    )
+
+    numerical_values = get_numerical_value_matrix(list_items)
+    value_codes = np.full(
+        (number_agents, len(list_items), number_criteria), -1, dtype=np.int8
+    )
+    for criterion_name in CriterionName:
+        column = numerical_values[:, criterion_name.value]
+        rated_rows = np.flatnonzero(~np.isnan(column))
+        for agent in range(number_agents):
+            value_codes[agent, rated_rows, criterion_name.value] = rate_numerical_values(
+                column[rated_rows], thresholds[agent, criterion_name.value], criterion_name
+            )
+
+    criteria = list(CriterionName)
+    return [
+        Preferences.from_value_matrix(
+            list_items,
+            value_codes[agent],
+            [criteria[column] for column in criterion_orders[agent]],
+            random_generator,
+        )
+        for agent in range(number_agents)
+    ]
+
+
+class Session:
+    """Session class.
+    State of an agent in its dialogue with a partner.
+
+    attr:
+        partner_id: the id of the partner (None until the session is bound to a partner)
+        items: the status of each item in the dialogue (ItemStatuses)
+        available_arguments: item -> (boolean decision, cursor over the remaining premisses to
+            argue with)
+        used_counter_arguments: (item, premiss) couples already used in an argument
+        is_done: whether the agent committed in the dialogue
+        committed_item: the item the agent committed on (None if it did not, or committed on no
+            item)
+    """
+
+    def __init__(self, partner_id: int | None, items: dict[Item, Status | None]):
+        self.partner_id = partner_id
+        self.items = ItemStatuses(items)
+        self.available_arguments = {}
+        self.used_counter_arguments: set[tuple[Item, Comparison | CoupleValue]] = set()
+        self.is_done = False
+        self.committed_item = None
+
+
 class ArgumentAgent(CommunicatingAgent):
-    """ArgumentAgent which inherit from CommunicatingAgent."""
+    """ArgumentAgent which inherit from CommunicatingAgent.
+
+    The agent argues in one session per partner, the items, available_arguments,
+    used_counter_arguments and is_done attributes being those of the current session (the one of
+    the message being processed). Until a session is opened, the current session is not bound to a
+    partner: it is bound to the first one.
+    """
 
     def __init__(
         self,
@@ -40,17 +258,83 @@ class ArgumentAgent(CommunicatingAgent):
         name,
         preferences: Preferences,
         rejection_threshold: int = 80,
+        pair_with_first_agent: bool = True,
     ):
+        """Creates the agent. If `pair_with_first_agent`, the agent opens a session with the first
+        other agent of the schedule when it steps without any session nor message."""
         super().__init__(unique_id, model, name)
         self.preferences: Preferences = preferences
-        self.items: dict[Item, Status | None] = {
-            criterion.get_item(): None
-            for criterion in self.preferences.get_criterion_value_list()
-        }
-        self.available_arguments = {}
-        self.used_counter_arguments = []
-        self.is_done = False
+        # the statuses of the items when a session is opened
+        self.__item_statuses = {item: None for item in self.preferences.get_items()}
+        # partner id -> session
+        self.sessions: dict[int, Session] = {}
+        # partner id -> session, for the sessions which are not done
+        self.__open_sessions: dict[int, Session] = {}
+        self.__session = Session(None, self.__item_statuses)
         self.rejection_threshold = rejection_threshold
+        self.pair_with_first_agent = pair_with_first_agent
+
+    def open_session(self, partner_id: int) -> Session:
+        """Returns the session with a partner, opening it if needed."""
+        session = self.sessions.get(partner_id)
+        if session is None:
+            if self.__session.partner_id is None:
+                session = self.__session
+                session.partner_id = partner_id
+            else:
+                session = Session(partner_id, self.__item_statuses)
+            self.sessions[partner_id] = session
+            if not session.is_done:
+                self.__open_sessions[partner_id] = session
+        return session
+
+    def abort_session(self, partner_id: int):
+        """Ends the session with a partner, if it is not done yet, without committing on any
+        item. The next messages of the partner in this session are ignored."""
+        session = self.sessions.get(partner_id)
+        if session is not None:
+            session.is_done = True
+            self.__open_sessions.pop(partner_id, None)
+
+    @property
+    def items(self) -> ItemStatuses:
+        """The status of each item in the current session."""
+        return self.__session.items
+
+    @items.setter
+    def items(self, items: dict[Item, Status | None]):
+        """Sets the statuses of the items in the current session and in the next opened ones."""
+        self.__item_statuses = dict(items)
+        self.__session.items = ItemStatuses(items)
+
+    @property
+    def available_arguments(self) -> dict:
+        """item -> (boolean decision, cursor over the remaining premisses to argue with), in the
+        current session."""
+        return self.__session.available_arguments
+
+    @property
+    def used_counter_arguments(self) -> set[tuple[Item, Comparison | CoupleValue]]:
+        """(item, premiss) couples already used in an argument in the current session."""
+        return self.__session.used_counter_arguments
+
+    @property
+    def is_done(self) -> bool:
+        """Whether the agent committed in all its sessions."""
+        if not self.sessions:
+            return self.__session.is_done
+        return not self.__open_sessions
+
+    @is_done.setter
+    def is_done(self, is_done: bool):
+        """Sets whether the agent committed in the current session."""
+        session = self.__session
+        session.is_done = is_done
+        if session.partner_id is not None:
+            if is_done:
+                self.__open_sessions.pop(session.partner_id, None)
+            else:
+                self.__open_sessions[session.partner_id] = session
 
     def accept(self, item: Item, agent_id: int):
         self.simple_send_message(
@@ -76,6 +360,7 @@ class ArgumentAgent(CommunicatingAgent):
 
     def commit(self, item: Item, agent_id: int):
         self.is_done = True
+        self.__session.committed_item = item
         self.simple_send_message(
             agent_id,
             MessagePerformative.COMMIT,
@@ -114,141 +399,149 @@ class ArgumentAgent(CommunicatingAgent):
 
     def step(self):
         super().step()
-        if self.is_done:
-            return
         messages = self.get_new_messages()
+        if self.pair_with_first_agent and not self.sessions and len(messages) == 0:
+            # no explicit session: argue with the first other agent, as with only 2 agents
+            partner = next(
+                (agent for agent in self.model.schedule.agent_buffer() if agent is not self),
+                None,
+            )
+            if partner is not None:
+                self.open_session(partner.unique_id)
+        partners_with_messages = self.__react_to_messages(messages)
+
+        # Make a new proposal in each session which received no message
+        for session in list(self.__open_sessions.values()):
+            if session.partner_id not in partners_with_messages:
+                self.__session = session
+                self.__make_proposal(session.partner_id)
+
+    def has_pending_work(self) -> bool:
+        """Whether the agent has to propose at its next step, even if it receives no message."""
+        if self.pair_with_first_agent and not self.sessions:
+            return True
+        return len(self.__open_sessions) > 0
+
+    def react(self):
+        """Reacts to the new messages, without proposing in the other sessions (in the asyncio
+        delivery mode)."""
+        self.__react_to_messages(self.get_new_messages())
+
+    def wake_up(self, agent_id):
+        """Makes a new proposal in the session with agent_id, which left the last message
+        unanswered (in the asyncio delivery mode)."""
+        session = self.open_session(agent_id)
+        if not session.is_done:
+            self.__session = session
+            self.__make_proposal(agent_id)
+
+    def __react_to_messages(self, messages) -> dict[int, bool]:
+        """Reacts to messages in their sessions, except in the sessions which are done, and returns
+        for each partner which sent a message whether its session was done before."""
+        partners_with_messages = {}
         for message in messages:
-            if message.get_performative() == MessagePerformative.PROPOSE:
-                # Find best non-impossible items over the minimal acceptable item
-                acceptable_minimums = [
-                    item
-                    for (item, status) in self.items.items()
-                    if status == Status.ACCEPTABLE_MINIMUM
-                ]
-                if len(acceptable_minimums) > 0:
-                    most_preferred_acceptable_minimum = self.preferences.most_preferred(
-                        acceptable_minimums
-                    )
-                    acceptable_items = [
-                        item
-                        for (item, status) in self.items.items()
-                        if status != Status.IMPOSSIBLE
-                        and self.preferences.is_preferred_item(
-                            item, most_preferred_acceptable_minimum
-                        )
-                    ]
+            session = self.open_session(message.get_exp())
+            if session.partner_id not in partners_with_messages:
+                partners_with_messages[session.partner_id] = session.is_done
+            if not partners_with_messages[session.partner_id]:
+                self.__session = session
+                self.__react(message)
+        return partners_with_messages
+
+    def __react(self, message):
+        """Reacts to a message of the partner of the current session."""
+        if message.get_performative() == MessagePerformative.PROPOSE:
+            # Find best non-impossible items over the minimal acceptable item
+            acceptable_items = self.items.get_best_items(
+                self.preferences,
+                NOT_IMPOSSIBLE_STATUSES,
+                self.items.get_best_score(
+                    self.preferences, (Status.ACCEPTABLE_MINIMUM,)
+                ),
+            )
+            if len(acceptable_items) == 0:
+                if message.get_content() is None:
+                    self.accept(None, message.get_exp())
+                    return
                 else:
-                    acceptable_items = [
-                        item
-                        for (item, status) in self.items.items()
-                        if status != Status.IMPOSSIBLE
-                    ]
-                if len(acceptable_items) == 0:
-                    if message.get_content() is None:
-                        self.accept(None, message.get_exp())
-                        continue
-                    else:
-                        # Il ne pourra jamais accepter l'item, mais il espère
-                        # déconstruire les arguments de l'autre pour qu'il accepte enfin
-                        # sa proposition préférée
-                        self.ask_why(message.get_content(), message.get_exp())
-                        continue
-
-                if self.items[message.get_content()] is not None:
-                    continue
-                self.items[
-                    message.get_content()
-                ] = Status.PROPOSED  # Do not propose again
-
-                if not self.preferences.is_item_among_top_n_percent(  # Si pas dans le top 10%, on le rejette
-                    message.get_content(), list(self.items), n=self.rejection_threshold
-                ):
-                    self.reject(message.get_content(), message.get_exp())
-                elif (  # Meilleur item non rejeté/contre-argumenté -> on accepte
-                    self.preferences.most_preferred(acceptable_items)
-                    == message.get_content()
-                ):
-                    self.accept(message.get_content(), message.get_exp())
-                else:  # Sinon --> Ask why (commence une argumentation)
+                    # Il ne pourra jamais accepter l'item, mais il espère
+                    # déconstruire les arguments de l'autre pour qu'il accepte enfin
+                    # sa proposition préférée
                     self.ask_why(message.get_content(), message.get_exp())
+                    return
 
-            elif message.get_performative() in (
-                MessagePerformative.ACCEPT,
-                MessagePerformative.COMMIT,
+            if self.items[message.get_content()] is not None:
+                return
+            self.items[
+                message.get_content()
+            ] = Status.PROPOSED  # Do not propose again
+
+            if not self.preferences.is_item_among_top_n_percent(  # Si pas dans le top 10%, on le rejette
+                message.get_content(), n=self.rejection_threshold
             ):
-                if message.get_content() in self.items or message.get_content() is None:
-                    self.commit(message.get_content(), message.get_exp())
-
-            elif message.get_performative() == MessagePerformative.ASK_WHY:
-                item = message.get_content()
-                argument = self.support_proposal(item, boolean_decision=True)
-                if argument is not None:
-                    self.argue(argument, message.get_exp())
-                else:
-                    argument = Argument(True, item)
-                    self.admit_defeat(argument, message.get_exp())
+                self.reject(message.get_content(), message.get_exp())
+            elif (  # Meilleur item non rejeté/contre-argumenté -> on accepte
+                self.preferences.most_preferred(acceptable_items)
+                == message.get_content()
+            ):
+                self.accept(message.get_content(), message.get_exp())
+            else:  # Sinon --> Ask why (commence une argumentation)
+                self.ask_why(message.get_content(), message.get_exp())
 
-            elif message.get_performative() == MessagePerformative.REJECT:
-                self.items[message.get_content()] = Status.IMPOSSIBLE
+        elif message.get_performative() in (
+            MessagePerformative.ACCEPT,
+            MessagePerformative.COMMIT,
+        ):
+            if message.get_content() in self.items or message.get_content() is None:
+                self.commit(message.get_content(), message.get_exp())
+
+        elif message.get_performative() == MessagePerformative.ASK_WHY:
+            item = message.get_content()
+            argument = self.support_proposal(item, boolean_decision=True)
+            if argument is not None:
+                self.argue(argument, message.get_exp())
+            else:
+                argument = Argument(True, item)
+                self.admit_defeat(argument, message.get_exp())
 
-            elif message.get_performative() == MessagePerformative.ADMIT_DEFEAT:
-                argument = message.get_content()
-                if argument.boolean_decision:
-                    self.items[argument.item] = Status.ACCEPTABLE_MINIMUM
-                else:
-                    self.items[argument.item] = Status.IMPOSSIBLE
-
-            elif message.get_performative() == MessagePerformative.ARGUE:
-                argument: Argument = message.get_content()
-                if (counter_argument := self.attack_argument(argument)) is not None:
-                    self.argue(counter_argument, message.get_exp())
-                elif (
-                    counter_argument := self.support_proposal(argument.item, False)
-                ) is not None:
-                    self.argue(counter_argument, message.get_exp())
-                else:
-                    self.admit_defeat(argument, message.get_exp())
+        elif message.get_performative() == MessagePerformative.REJECT:
+            self.items[message.get_content()] = Status.IMPOSSIBLE
 
-        # Make a new proposal
-        if (
-            len(messages) == 0
-            and self.model.schedule.get_agent_count() > 0  # Au moins 2 agents
-        ):
-            acceptable_minimums = [
-                item
-                for (item, status) in self.items.items()
-                if status == Status.ACCEPTABLE_MINIMUM
-            ]
-            if len(acceptable_minimums) > 0:
-                most_preferred_acceptable_minimum = self.preferences.most_preferred(
-                    acceptable_minimums
-                )
-                acceptable_proposals = [
-                    item
-                    for (item, status) in self.items.items()
-                    if status in (None, Status.ARGUMENT_ENDED_WITH_DEFEAT)
-                    and self.preferences.is_preferred_item(
-                        item, most_preferred_acceptable_minimum
-                    )
-                ]
+        elif message.get_performative() == MessagePerformative.ADMIT_DEFEAT:
+            argument = message.get_content()
+            if argument.boolean_decision:
+                self.items[argument.item] = Status.ACCEPTABLE_MINIMUM
             else:
-                acceptable_proposals = [
-                    item
-                    for (item, status) in self.items.items()
-                    if status in (None, Status.ARGUMENT_ENDED_WITH_DEFEAT)
-                ]
-            other_agent = [
-                agent for agent in self.model.schedule.agent_buffer() if agent != self
-            ][0]
-            if acceptable_proposals:  # Au moins 1 item disponible
-                chosen_item = self.preferences.most_preferred(acceptable_proposals)
-                if self.items[chosen_item] == Status.ARGUMENT_ENDED_WITH_DEFEAT:
-                    # Si la meilleure proposition est un argument perdu, accepter car l'autre agent ne descendra pas plus bas
-                    self.accept(chosen_item, other_agent.unique_id)
-                else:
-                    self.propose(chosen_item, other_agent.unique_id)
-            else:  # Plus d'item disponible, impossible de trouver un accord
-                self.propose(None, other_agent.unique_id)
+                self.items[argument.item] = Status.IMPOSSIBLE
+
+        elif message.get_performative() == MessagePerformative.ARGUE:
+            argument: Argument = message.get_content()
+            if (counter_argument := self.attack_argument(argument)) is not None:
+                self.argue(counter_argument, message.get_exp())
+            elif (
+                counter_argument := self.support_proposal(argument.item, False)
+            ) is not None:
+                self.argue(counter_argument, message.get_exp())
+            else:
+                self.admit_defeat(argument, message.get_exp())
+
+    def __make_proposal(self, partner_id: int):
+        """Proposes the preferred proposable item (or accepts it, or proposes None if there is
+        none) to the partner of the current session."""
+        acceptable_proposals = self.items.get_best_items(
+            self.preferences,
+            PROPOSABLE_STATUSES,
+            self.items.get_best_score(self.preferences, (Status.ACCEPTABLE_MINIMUM,)),
+        )
+        if acceptable_proposals:  # Au moins 1 item disponible
+            chosen_item = self.preferences.most_preferred(acceptable_proposals)
+            if self.items[chosen_item] == Status.ARGUMENT_ENDED_WITH_DEFEAT:
+                # Si la meilleure proposition est un argument perdu, accepter car l'autre agent ne descendra pas plus bas
+                self.accept(chosen_item, partner_id)
+            else:
+                self.propose(chosen_item, partner_id)
+        else:  # Plus d'item disponible, impossible de trouver un accord
+            self.propose(None, partner_id)
 
     def generate_preferences(self, list_items: list[Item]):
         self.items = {item: None for item in list_items}
@@ -258,6 +551,7 @@ class ArgumentAgent(CommunicatingAgent):
         self.preferences.set_criterion_name_list(list_criterions)
 
         # for each criterion draw a random set of preferences and evaluate all the items according to it
+        numerical_values = get_numerical_value_matrix(list_items)
         for criterion_name in CriterionName:
             criterion_range = criterion_name.criterion_range
             criterion_span = criterion_range[1] - criterion_range[0]
@@ -265,53 +559,24 @@ class ArgumentAgent(CommunicatingAgent):
                 random.random() * criterion_span + criterion_range[0] for _ in range(3)
             ]
             three_p.sort()
-            [p1, p2, p3] = three_p
-            for item in list_items:
-                if criterion_name in item.get_criterion_values().keys():
-                    numerical_value = item.get_criterion_value(criterion_name)
-                    if numerical_value < p1:
-                        criterion_value = CriterionValue(
-                            item,
-                            criterion_name,
-                            Value.VERY_GOOD
-                            if criterion_name.lower_is_better
-                            else Value.VERY_BAD,
-                        )
-                    elif numerical_value >= p1 and numerical_value < p2:
-                        criterion_value = CriterionValue(
-                            item,
-                            criterion_name,
-                            Value.GOOD if criterion_name.lower_is_better else Value.BAD,
-                        )
-                    elif numerical_value >= p2 and numerical_value < p3:
-                        criterion_value = CriterionValue(
-                            item,
-                            criterion_name,
-                            Value.BAD if criterion_name.lower_is_better else Value.GOOD,
-                        )
-                    elif numerical_value >= p3:
-                        criterion_value = CriterionValue(
-                            item,
-                            criterion_name,
-                            Value.VERY_BAD
-                            if criterion_name.lower_is_better
-                            else Value.VERY_GOOD,
-                        )
-                    self.preferences.add_criterion_value(criterion_value)
-
-    def send_message(self, message):
-        super().send_message(message)
-        print(message)
+            column = numerical_values[:, criterion_name.value]
+            rated_rows = np.flatnonzero(~np.isnan(column))
+            self.preferences.add_criterion_values(
+                [list_items[row] for row in rated_rows],
+                criterion_name,
+                rate_numerical_values(column[rated_rows], three_p, criterion_name),
+            )
 
     def list_supporting_proposal(self, item: Item) -> list[Argument]:
         """
         Generate a list of premisses which can be used to support an item
         :param item: Item - name of the item
-        return: list of all premisses CON an item (sorted by order of importance based on preferences)
+        return: list of all premisses PRO an item (sorted by order of importance based on preferences)
         """
-        return self._list_proposal_with_given_values(
-            item, [Value.GOOD, Value.VERY_GOOD]
-        )
+        return [
+            Argument(True, item, couple_values_list=(couple_value,))
+            for couple_value in self.preferences.get_supporting_premisses(item)
+        ]
 
     def list_attacking_proposal(self, item: Item) -> list[Argument]:
         """
@@ -319,66 +584,26 @@ class ArgumentAgent(CommunicatingAgent):
         :param item: Item - name of the item
         :return: list of all premisses CON an item (sorted by order of importance based on preferences)
         """
-        return self._list_proposal_with_given_values(item, [Value.BAD, Value.VERY_BAD])
-
-    def _list_proposal_with_given_values(
-        self, item: Item, values_list: Iterable[Value]
-    ) -> list[Argument]:
-        """
-        Generate a list of premisses which can be used to attack an item
-        :param item: Item - name of the item
-        :return: list of all premisses CON an item (sorted by order of importance based on preferences)
-        """
-        result = []
-        for value_preference in self.preferences.get_sorted_criterion_value_list():
-            if value_preference.get_item() == item:
-                if value_preference.get_value() in values_list:
-                    boolean_decision = values_list == [Value.GOOD, Value.VERY_GOOD]
-                    argument = Argument(boolean_decision=boolean_decision, item=item)
-                    argument.add_premiss_couple_value(
-                        CoupleValue(
-                            value_preference.get_criterion_name(),
-                            value_preference.get_value(),
-                        )
-                    )
-                    result.append(argument)
-        return result
+        return [
+            Argument(False, item, couple_values_list=(couple_value,))
+            for couple_value in self.preferences.get_attacking_premisses(item)
+        ]
 
     def attack_criterion_importance(
         self, item, criterion_name: CriterionName, boolean_decision
     ) -> tuple[Comparison, CoupleValue] | None:
         # Counter argument on the importance of an item
-        ordered_criteria = self.preferences.get_criterion_name_list()
-        for own_criterion in ordered_criteria[: ordered_criteria.index(criterion_name)][
-            ::-1
-        ]:
-            if self.preferences.is_preferred_criterion(own_criterion, criterion_name):
-                positive_value = self.preferences.get_value(item, own_criterion) in (
-                    Value.GOOD,
-                    Value.VERY_GOOD,
-                )
-                if ((not positive_value) and boolean_decision) or (
-                    positive_value and not boolean_decision
-                ):
-                    return Comparison(own_criterion, criterion_name), CoupleValue(
-                        own_criterion, self.preferences.get_value(item, own_criterion)
-                    )
+        return self.preferences.get_counter_premisses(
+            item, criterion_name, None, boolean_decision
+        )[1]
 
     def attack_criterion_value(
         self, item, couple_value: CoupleValue, boolean_decision: bool
     ) -> CoupleValue | None:
         # Counter argument on the value of an item
-        own_value = self.preferences.get_value(item, couple_value.criterion_name)
-        if (
-            couple_value.value.value < own_value.value
-            and not boolean_decision
-            and own_value.value >= Value.GOOD.value
-        ) or (
-            couple_value.value.value > own_value.value
-            and boolean_decision
-            and own_value.value <= Value.BAD.value
-        ):
-            return CoupleValue(couple_value.criterion_name, own_value)
+        return self.preferences.get_counter_premisses(
+            item, couple_value.criterion_name, couple_value.value, boolean_decision
+        )[0]
 
     def attack_argument(self, argument: Argument) -> Argument | None:
         """
@@ -387,36 +612,37 @@ class ArgumentAgent(CommunicatingAgent):
         :return: a counter-argument, or None if none exists.
         """
         item = argument.item
-        counter_argument = Argument(
-            boolean_decision=not argument.boolean_decision, item=item
-        )
         for couple_value in argument.couple_values_list:
+            own_couple_value, importance_counter = self.preferences.get_counter_premisses(
+                item,
+                couple_value.criterion_name,
+                couple_value.value,
+                argument.boolean_decision,
+            )
             # Counter argument on the value of an criterion
-            if (
-                own_couple_value := self.attack_criterion_value(
-                    item, couple_value, argument.boolean_decision
-                )
-            ) is not None:
+            if own_couple_value is not None:
                 if (item, own_couple_value) not in self.used_counter_arguments:
-                    counter_argument.add_premiss_couple_value(own_couple_value)
-                    self.used_counter_arguments.append((item, own_couple_value))
-                    return counter_argument
+                    self.used_counter_arguments.add((item, own_couple_value))
+                    return Argument(
+                        not argument.boolean_decision,
+                        item,
+                        couple_values_list=(own_couple_value,),
+                    )
             # Counter argument on the importance of an item
-            if (
-                res := self.attack_criterion_importance(
-                    item, couple_value.criterion_name, argument.boolean_decision
-                )
-            ) is not None:
-                comparison, own_couple_value = res
+            if importance_counter is not None:
+                comparison, own_couple_value = importance_counter
                 if (item, comparison) not in self.used_counter_arguments and (
                     item,
                     own_couple_value,
                 ) not in self.used_counter_arguments:
-                    self.used_counter_arguments.append((item, comparison))
-                    self.used_counter_arguments.append((item, own_couple_value))
-                    counter_argument.add_premiss_comparison(comparison)
-                    counter_argument.add_premiss_couple_value(own_couple_value)
-                    return counter_argument
+                    self.used_counter_arguments.add((item, comparison))
+                    self.used_counter_arguments.add((item, own_couple_value))
+                    return Argument(
+                        not argument.boolean_decision,
+                        item,
+                        comparison_list=(comparison,),
+                        couple_values_list=(own_couple_value,),
+                    )
 
     def support_proposal(self, item: Item, boolean_decision: bool) -> Argument | None:
         """
@@ -425,38 +651,80 @@ class ArgumentAgent(CommunicatingAgent):
         :return: the strongest supportive argument
         """
         if not item in self.available_arguments:
+            # a cursor over the premisses table of the item, shared with the preferences
             if boolean_decision:
-                self.available_arguments[item] = self.list_supporting_proposal(item)
+                premisses = self.preferences.get_supporting_premisses(item)
             else:
-                self.available_arguments[item] = self.list_attacking_proposal(item)
-        while len(self.available_arguments[item]) > 0:
-            argument: Argument = self.available_arguments[item].pop(0)
-            if (
-                argument.item,
-                argument.couple_values_list[0],
-            ) not in self.used_counter_arguments:
-                self.used_counter_arguments.append(argument)
-                self.used_counter_arguments.extend(
-                    (item, couple_value) for couple_value in argument.couple_values_list
-                )
-                return argument
+                premisses = self.preferences.get_attacking_premisses(item)
+            self.available_arguments[item] = (boolean_decision, iter(premisses))
+        boolean_decision, premisses = self.available_arguments[item]
+        for couple_value in premisses:
+            if (item, couple_value) not in self.used_counter_arguments:
+                self.used_counter_arguments.add((item, couple_value))
+                return Argument(boolean_decision, item, couple_values_list=(couple_value,))
         return None
 
 
 class ArgumentModel(Model):
     """ArgumentModel which inherit from Model."""
 
-    def __init__(self, list_items):
-        self.schedule = BaseScheduler(self)
+    def __init__(
+        self,
+        list_items,
+        seed=None,
+        n_agents=2,
+        pairings=None,
+        mailbox_retention_policy=RetentionPolicy.KEEP_ALL,
+        mailbox_max_read_messages=None,
+        trace_sink=None,
+        async_latency=None,
+        event_driven=False,
+    ):
+        """Creates the model, the preferences of the agents being drawn from `seed` (random if None).
+        The `n_agents` agents (of ids 1 to n_agents) argue in a session for each pair of ids of
+        `pairings`, by default (1, 2), (3, 4), and so on.
+        The mailboxes of the agents keep their read messages according to `mailbox_retention_policy`.
+        The sent messages are traced to `trace_sink`, printed by default.
+        If `async_latency` is given, the messages are delivered with this latency (in seconds, or a
+        function of the message) by an asyncio event loop, and the model is run with run_async.
+        If `event_driven`, only the agents which received a message or have to propose are
+        activated at each step.
+        """
+        self.random.seed(seed)
+        self.mailbox_retention_policy = mailbox_retention_policy
+        self.mailbox_max_read_messages = mailbox_max_read_messages
+        if event_driven:
+            self.schedule = EventDrivenActivation(self)
+        else:
+            self.schedule = BaseScheduler(self)
         # self.schedule = RandomActivation(self)
-        self.__messages_service = MessageService(self.schedule)
-        A1 = ArgumentAgent(1, self, "A1", Preferences())
-        A2 = ArgumentAgent(2, self, "A2", Preferences())
-        A1.generate_preferences(list_items)
-        A2.generate_preferences(list_items)
-
-        self.schedule.add(A1)
-        self.schedule.add(A2)
+        if trace_sink is None:
+            trace_sink = ConsoleTraceSink()
+        if async_latency is None:
+            self.__messages_service = MessageService(self.schedule, trace_sink=trace_sink)
+        else:
+            self.__messages_service = AsyncMessageService(
+                self.schedule, latency=async_latency, trace_sink=trace_sink
+            )
+        preferences = generate_population_preferences(
+            list_items, n_agents, seed, random_generator=self.random
+        )
+        if event_driven:
+            self.__messages_service.add_delivery_listener(
+                lambda message: self.schedule.wake(message.get_dest())
+            )
+        for i in range(n_agents):
+            self.schedule.add(
+                ArgumentAgent(
+                    i + 1, self, f"A{i + 1}", preferences[i], pair_with_first_agent=False
+                )
+            )
+        if pairings is None:
+            pairings = [(i, i + 1) for i in range(1, n_agents, 2)]
+        # the first agent of each pairing starts the dialogue when the model is run with run_async
+        self.__pairings = list(pairings)
+        for agent_id, partner_id in self.__pairings:
+            self.open_session(agent_id, partner_id)
 
         self.running = True
 
@@ -464,6 +732,52 @@ class ArgumentModel(Model):
         self.__messages_service.dispatch_messages()
         self.schedule.step()
 
+    def run_until_done(self, max_steps=100) -> int:
+        """Steps the model until every agent is done, or no message was sent during a step and
+        none is left to dispatch or to read, but at most max_steps times.
+        Sets running to False once done, flushes the trace of the messages, and returns the number
+        of steps."""
+        messages_service = self.__messages_service
+        agents = self.schedule.agents
+        steps = 0
+        while self.running and steps < max_steps:
+            sent_count = messages_service.get_sent_count()
+            self.step()
+            steps += 1
+            if all(agent.is_done for agent in agents) or (
+                messages_service.get_sent_count() == sent_count
+                and not messages_service.has_messages_to_proceed()
+                and not any(agent.has_new_messages() for agent in agents)
+            ):
+                self.running = False
+        messages_service.flush()
+        return steps
+
+    def open_session(self, agent_id: int, partner_id: int):
+        """Opens a session between two agents."""
+        find_agent_from_id = self.__messages_service.find_agent_from_id
+        find_agent_from_id(agent_id).open_session(partner_id)
+        find_agent_from_id(partner_id).open_session(agent_id)
+        if isinstance(self.schedule, EventDrivenActivation):
+            self.schedule.wake(agent_id)
+            self.schedule.wake(partner_id)
+
+    async def run_async(self, max_messages=None):
+        """Runs the dialogues started by the first agent of each pairing in the event loop until no
+        message is left (the model must have an `async_latency`), flushes the trace of the
+        messages, and returns the number of sent messages."""
+        find_agent_from_id = self.__messages_service.find_agent_from_id
+        try:
+            return await self.__messages_service.run(
+                [
+                    (find_agent_from_id(agent_id), partner_id)
+                    for agent_id, partner_id in self.__pairings
+                ],
+                max_messages=max_messages,
+            )
+        finally:
+            self.__messages_service.flush()
+
     def get_message_service(self):
         return self.__messages_service
 
@@ -519,5 +833,4 @@ if __name__ == "__main__":
     argument_model = ArgumentModel(list_items)
     print(argument_model.schedule.agents[0].preferences)
     print(argument_model.schedule.agents[1].preferences)
-    for _ in range(100):
-        argument_model.step()
+    argument_model.run_until_done(100)
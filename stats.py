@@ -1,12 +1,14 @@
 from pw_argumentation import ArgumentModel, ArgumentAgent
+from communication.mailbox.RetentionPolicy import RetentionPolicy
 from communication.preferences.Item import Item
 from communication.preferences.CriterionName import CriterionName
 from communication.message.MessagePerformative import MessagePerformative
-from communication.message.MessageService import MessageService
-from collections import Counter
-import matplotlib.pyplot as plt
+from communication.message.TraceSink import ConsoleTraceSink, NullTraceSink
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
 import numpy as np
-from copy import deepcopy
 
 list_items = [
     Item(
@@ -56,95 +58,267 @@ list_items = [
 ]
 
 
-def compute_percentage_of_agreements_and_ranks(number_runs, list_items=list_items):
-    # both counters must contain same values as agents should commit on same thing
-    agreed_on = [Counter(), Counter()]
-    commited_item_rank = [Counter(), Counter()]
+def get_run_seed(master_seed, run) -> int:
+    """Returns the seed of a run, derived from the master seed and the number of the run only."""
+    return int(np.random.SeedSequence(master_seed, spawn_key=(run,)).generate_state(1)[0])
 
-    for n in range(number_runs):
-        argument_model = ArgumentModel(list_items)
 
-        print(f"\nExperiment {n} :")
+def run_dialogue(run, master_seed, list_items=list_items, verbose=False) -> ArgumentModel:
+    """Runs the dialogue of a run until the agents are done, and returns its model."""
+    argument_model = ArgumentModel(
+        list_items,
+        seed=get_run_seed(master_seed, run),
+        mailbox_retention_policy=RetentionPolicy.KEEP_TERMINAL,
+        trace_sink=ConsoleTraceSink() if verbose else NullTraceSink(),
+    )
+    if verbose:
+        print(f"\nExperiment {run} :")
         print(argument_model.schedule.agents[0].preferences)
         print(argument_model.schedule.agents[1].preferences)
-        for _ in range(100):
-            argument_model.step()
-        agents: list[ArgumentAgent] = argument_model.schedule.agents
+    argument_model.run_until_done(100)
+    return argument_model
+
 
-        favorite_items_sorted = [
-            [
-                item.get_name()
-                for item in agent.preferences.sort_item_list_by_preference(list_items)
-            ]
-            for agent in agents
+def get_favorite_items_sorted(agents, list_items) -> list[list[str]]:
+    """Returns the names of the items sorted by the preferences of each agent."""
+    return [
+        [
+            item.get_name()
+            # sort a copy, as the order of list_items must not depend on the previous runs
+            for item in agent.preferences.sort_item_list_by_preference(list(list_items))
         ]
+        for agent in agents
+    ]
 
-        for i, agent in enumerate(agents):
-            commited = False
-            for message in agent.get_messages():
-                if message.get_performative() == MessagePerformative.COMMIT:
-                    commited = True
-                    commit_on = message.get_content()
-                    if commit_on is None:
-                        agreed_on[i]["None"] += 1
-                    elif isinstance(commit_on, Item):
-                        agreed_on[i][commit_on.get_name()] += 1
-                        commited_item_rank[i][
-                            favorite_items_sorted[i].index(commit_on.get_name()) + 1
-                        ] += 1
-
-                    else:
-                        raise ValueError("Commit can only contain object or None")
-            if not commited:
-                agreed_on[i]["No commit"] += 1
-        MessageService.reset()
-    return agreed_on, commited_item_rank
 
+class SweepAggregator:
+    """SweepAggregator class.
+    Online aggregation of the outcomes of the runs of a sweep, which takes the same memory whatever
+    the number of runs, and can be saved to (and loaded from) a JSON checkpoint.
+
+    attr:
+        seed: the master seed of the sweep
+        number_items: the number of items of the sweep
+        number_runs: the number of runs of the sweep (None for the aggregator of a chunk)
+        runs_done: the number of runs aggregated, which are the first ones of the sweep
+        agreed_on: for each agent, the number of runs it commited on each item (or "None", or
+            "No commit")
+        commited_item_rank: for each agent, the number of runs it commited on the item of each rank
+        confusion_matrix: the number of runs both agents commited on items of each couple of ranks
+        score_cache_hits, score_cache_misses: the score cache statistics of the agents
+    """
 
-def compute_confusion_matrix_of_ranks(number_runs, list_items=list_items):
-    confusion_matrix = np.zeros((len(list_items), len(list_items)))
+    VERSION = 2
 
-    for n in range(number_runs):
-        MessageService.reset()
-        argument_model = ArgumentModel(list_items)
-        print(f"\nExperiment {n} :")
-        for _ in range(100):
-            argument_model.step()
+    def __init__(self, seed, number_items, number_runs=None):
+        self.seed = seed
+        self.number_items = number_items
+        self.number_runs = number_runs
+        self.runs_done = 0
+        # both counters must contain same values as agents should commit on same thing
+        self.agreed_on = [Counter(), Counter()]
+        self.commited_item_rank = [Counter(), Counter()]
+        self.confusion_matrix = np.zeros((number_items, number_items))
+        self.score_cache_hits = 0
+        self.score_cache_misses = 0
+
+    def add_run(self, argument_model: ArgumentModel, list_items):
+        """Aggregates the outcome of the next run of the sweep."""
         agents: list[ArgumentAgent] = argument_model.schedule.agents
+        favorite_items_sorted = get_favorite_items_sorted(agents, list_items)
 
-        favorite_items_sorted = [
-            [
-                item.get_name()
-                for item in agent.preferences.sort_item_list_by_preference(list_items)
-            ]
-            for agent in agents
-        ]
         agents_ranks = [None, None]
         for i, agent in enumerate(agents):
             commited = False
-            for message in agent.get_messages():
-                if message.get_performative() == MessagePerformative.COMMIT:
-                    commited = True
-                    commit_on = message.get_content()
-                    if commit_on is None:
-                        pass
-                    elif isinstance(commit_on, Item):
-                        rank = favorite_items_sorted[i].index(commit_on.get_name())
-                        agents_ranks[i] = rank
-                    else:
-                        raise ValueError("Commit can only contain object or None")
+            for message in agent.get_messages_from_performative(
+                MessagePerformative.COMMIT
+            ):
+                commited = True
+                commit_on = message.get_content()
+                if commit_on is None:
+                    self.agreed_on[i]["None"] += 1
+                elif isinstance(commit_on, Item):
+                    rank = favorite_items_sorted[i].index(commit_on.get_name())
+                    self.agreed_on[i][commit_on.get_name()] += 1
+                    self.commited_item_rank[i][rank + 1] += 1
+                    agents_ranks[i] = rank
+                else:
+                    raise ValueError("Commit can only contain object or None")
             if not commited:
-                agreed_on[i]["No commit"] += 1
+                self.agreed_on[i]["No commit"] += 1
+            hits, misses = agent.preferences.get_score_cache_info()
+            self.score_cache_hits += hits
+            self.score_cache_misses += misses
         agent1_rank = agents_ranks[0]
         agent2_rank = agents_ranks[1]
         if agent1_rank is not None and agent2_rank is not None:
-            confusion_matrix[agent1_rank, agent2_rank] += 1
+            self.confusion_matrix[agent1_rank, agent2_rank] += 1
+        self.runs_done += 1
+
+    def merge(self, other: "SweepAggregator"):
+        """Aggregates the runs of another aggregator, which follow the runs of this one."""
+        for i in range(2):
+            self.agreed_on[i].update(other.agreed_on[i])
+            self.commited_item_rank[i].update(other.commited_item_rank[i])
+        self.confusion_matrix += other.confusion_matrix
+        self.score_cache_hits += other.score_cache_hits
+        self.score_cache_misses += other.score_cache_misses
+        self.runs_done += other.runs_done
+
+    def save(self, path):
+        """Writes the aggregator to a JSON checkpoint, replacing the previous one at once."""
+        checkpoint = {
+            "version": self.VERSION,
+            "seed": self.seed,
+            "number_items": self.number_items,
+            "number_runs": self.number_runs,
+            "runs_done": self.runs_done,
+            # lists of couples keep the order and the type of the keys
+            "agreed_on": [list(counter.items()) for counter in self.agreed_on],
+            "commited_item_rank": [
+                list(counter.items()) for counter in self.commited_item_rank
+            ],
+            "confusion_matrix": self.confusion_matrix.tolist(),
+            "score_cache_hits": self.score_cache_hits,
+            "score_cache_misses": self.score_cache_misses,
+        }
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path) -> "SweepAggregator":
+        """Reads an aggregator from a JSON checkpoint."""
+        with open(path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if checkpoint["version"] != cls.VERSION:
+            raise ValueError(f"{path} is not a checkpoint of version {cls.VERSION}")
+        aggregator = cls(
+            checkpoint["seed"], checkpoint["number_items"], checkpoint["number_runs"]
+        )
+        aggregator.runs_done = checkpoint["runs_done"]
+        aggregator.agreed_on = [Counter(dict(items)) for items in checkpoint["agreed_on"]]
+        aggregator.commited_item_rank = [
+            Counter(dict(items)) for items in checkpoint["commited_item_rank"]
+        ]
+        aggregator.confusion_matrix = np.array(checkpoint["confusion_matrix"], dtype=float)
+        aggregator.score_cache_hits = checkpoint["score_cache_hits"]
+        aggregator.score_cache_misses = checkpoint["score_cache_misses"]
+        return aggregator
+
+
+def aggregate_chunk(runs, master_seed, list_items, verbose) -> SweepAggregator:
+    """Runs the dialogues of a chunk of runs, and returns the aggregation of their outcomes."""
+    aggregator = SweepAggregator(master_seed, len(list_items))
+    for run in runs:
+        aggregator.add_run(run_dialogue(run, master_seed, list_items, verbose), list_items)
+    return aggregator
+
+
+def map_chunks(
+    compute_chunk, first_run, number_runs, master_seed, list_items, verbose, max_workers, chunk_size
+):
+    """Yields the results of compute_chunk on consecutive chunks of the runs from first_run, in the
+    order of the runs, computed by a pool of max_workers processes (in this process if max_workers
+    is 1). At most two chunks per process are computed ahead of the one yielded."""
+    chunks = (
+        range(start, min(start + chunk_size, number_runs))
+        for start in range(first_run, number_runs, chunk_size)
+    )
+    if max_workers == 1:
+        for chunk in chunks:
+            yield compute_chunk(chunk, master_seed, list_items, verbose)
+        return
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = deque()
+        for chunk in chunks:
+            futures.append(
+                executor.submit(compute_chunk, chunk, master_seed, list_items, verbose)
+            )
+            if len(futures) >= 2 * max_workers:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
 
-    return confusion_matrix
+def run_sweep(
+    number_runs,
+    list_items=list_items,
+    verbose=False,
+    seed=0,
+    max_workers=1,
+    chunk_size=100,
+    checkpoint_path=None,
+    checkpoint_every=1000,
+) -> SweepAggregator:
+    """Runs number_runs dialogues, in chunks of chunk_size runs spread over max_workers processes,
+    and returns the aggregation of their outcomes.
+    The seed of each run is derived from `seed`, so the results do not depend on the chunks and
+    processes. The dialogues and preferences are only printed when verbose.
+    If checkpoint_path is given, the aggregation is saved there about every checkpoint_every runs,
+    and the sweep resumes from it if it exists. The checkpoint is deleted once the sweep is done.
+    """
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        aggregator = SweepAggregator.load(checkpoint_path)
+        if (
+            aggregator.seed != seed
+            or aggregator.number_items != len(list_items)
+            or aggregator.number_runs != number_runs
+            or aggregator.runs_done > number_runs
+        ):
+            raise ValueError(f"{checkpoint_path} is the checkpoint of another sweep")
+    else:
+        aggregator = SweepAggregator(seed, len(list_items), number_runs)
+    last_checkpoint = aggregator.runs_done
+    # the chunks are merged in the order of the runs
+    for chunk_aggregator in map_chunks(
+        aggregate_chunk,
+        aggregator.runs_done,
+        number_runs,
+        seed,
+        list_items,
+        verbose,
+        max_workers,
+        chunk_size,
+    ):
+        aggregator.merge(chunk_aggregator)
+        if (
+            checkpoint_path is not None
+            and aggregator.runs_done - last_checkpoint >= checkpoint_every
+        ):
+            aggregator.save(checkpoint_path)
+            last_checkpoint = aggregator.runs_done
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return aggregator
+
+
+def compute_percentage_of_agreements_and_ranks(number_runs, list_items=list_items, **kwargs):
+    """Runs a sweep of number_runs dialogues (see run_sweep for the other arguments), and returns
+    for each agent the items it commited on and their ranks."""
+    aggregator = run_sweep(number_runs, list_items, **kwargs)
+    print(
+        f"\nScore cache : {aggregator.score_cache_hits} hits, "
+        f"{aggregator.score_cache_misses} misses"
+    )
+    return aggregator.agreed_on, aggregator.commited_item_rank
+
+
+def compute_confusion_matrix_of_ranks(number_runs, list_items=list_items, **kwargs):
+    """Runs a sweep of number_runs dialogues (see run_sweep for the other arguments), and returns
+    the confusion matrix of the ranks of the items both agents commited on."""
+    return run_sweep(number_runs, list_items, **kwargs).confusion_matrix
 
 
 if __name__ == "__main__":
-    agreed_on, commited_item_rank = compute_percentage_of_agreements_and_ranks(10000)
+    import matplotlib.pyplot as plt
+
+    agreed_on, commited_item_rank = compute_percentage_of_agreements_and_ranks(
+        10000, max_workers=os.cpu_count(), checkpoint_path="stats_checkpoint.json"
+    )
 
     fig, axes = plt.subplots(ncols=len(agreed_on))
 
@@ -1,13 +1,36 @@
+import asyncio
+import io
+import os
+import random
+import tempfile
+
+import numpy as np
 from mesa import Model
 from mesa.time import BaseScheduler
 
+import pw_argumentation
+import stats
+import tournament
+from communication.message.MessagePerformative import MessagePerformative
+from communication.message.BinaryTrace import BinaryTraceReader, BinaryTraceSink
 from communication.message.MessageService import MessageService
+from communication.message.TraceSink import (
+    BufferedTextTraceSink,
+    ConsoleTraceSink,
+    NullTraceSink,
+)
 from communication.preferences.CriterionName import CriterionName
 from communication.preferences.CriterionValue import CriterionValue
 from communication.preferences.Item import Item
 from communication.preferences.Preferences import Preferences
 from communication.preferences.Value import Value
-from pw_argumentation import ArgumentAgent
+from pw_argumentation import (
+    NOT_IMPOSSIBLE_STATUSES,
+    PROPOSABLE_STATUSES,
+    ArgumentAgent,
+    ItemStatuses,
+    Status,
+)
 
 
 def test1():
@@ -188,12 +211,313 @@ def test3():
         model.step()
 
 
+def test4():
+    # the third agent is not paired by default
+    model = pw_argumentation.ArgumentModel(
+        stats.list_items, seed=0, n_agents=3, trace_sink=NullTraceSink()
+    )
+    A1, A2, A3 = model.schedule.agents
+    assert list(A1.sessions) == [2] and list(A2.sessions) == [1]
+    assert A3.sessions == {}
+    model.run_until_done()
+    assert A1.is_done and A2.is_done
+    assert A3.sessions == {} and A3.get_messages() == []
+
+    # every pairing opens a session on both sides, with its own item statuses
+    pairings = [(1, 2), (1, 3), (2, 3)]
+    model = pw_argumentation.ArgumentModel(
+        stats.list_items, seed=0, n_agents=3, pairings=pairings, trace_sink=NullTraceSink()
+    )
+    agents = {agent.unique_id: agent for agent in model.schedule.agents}
+    for agent_id, partner_id in pairings:
+        assert agents[agent_id].sessions[partner_id].partner_id == partner_id
+        assert agents[partner_id].sessions[agent_id].partner_id == agent_id
+    item = stats.list_items[0]
+    agents[1].sessions[2].items[item] = Status.PROPOSED
+    assert agents[1].sessions[3].items[item] is None
+    assert agents[2].sessions[1].items[item] is None
+    agents[1].sessions[2].items[item] = None
+
+    # every dialogue ends, both agents committing on the same item (or on no item)
+    model.run_until_done()
+    for agent_id, partner_id in pairings:
+        session = agents[agent_id].sessions[partner_id]
+        partner_session = agents[partner_id].sessions[agent_id]
+        assert session.is_done and partner_session.is_done
+        assert session.committed_item is partner_session.committed_item
+    assert all(agent.is_done for agent in agents.values())
+
+
+def test5():
+    # a round robin pairs every agent with every other one exactly once
+    pairings = tournament.round_robin_pairings([1, 2, 3, 4, 5])
+    assert len(pairings) == 10
+    assert {frozenset(pairing) for pairing in pairings} == {
+        frozenset((agent_id, partner_id))
+        for agent_id in range(1, 6)
+        for partner_id in range(agent_id + 1, 6)
+    }
+
+    # a Swiss round skips the pairings already played when another partner is left
+    agent_ids = [1, 2, 3, 4]
+    points = {1: 1, 2: 1, 3: 0, 4: 0}
+    assert tournament.swiss_pairings(agent_ids, points, {frozenset((1, 2))}) == [(1, 3), (2, 4)]
+    played = set()
+    for _ in range(3):
+        pairings = tournament.swiss_pairings(agent_ids, points, played)
+        assert len(pairings) == 2
+        for pairing in pairings:
+            assert frozenset(pairing) not in played
+            played.add(frozenset(pairing))
+    assert len(played) == 6
+
+    # the dialogues cut by max_steps end without agreement, and do not disturb the next ones
+    model = pw_argumentation.ArgumentModel(
+        stats.list_items,
+        seed=0,
+        n_agents=4,
+        pairings=[],
+        trace_sink=NullTraceSink(),
+        event_driven=True,
+    )
+    assert tournament.play(model, [(1, 2), (3, 4)], max_steps=1) == 1
+    assert all(agent.is_done for agent in model.schedule.agents)
+    assert not tournament.get_agreement(model, 1, 2)
+    assert not tournament.get_agreement(model, 3, 4)
+    assert tournament.play(model, [(1, 3), (2, 4)], max_steps=1000) < 1000
+    for agent_id, partner_id in ((1, 3), (2, 4)):
+        session = model.get_message_service().find_agent_from_id(agent_id).sessions[partner_id]
+        assert session.is_done
+    agreement_rates, number_dialogues, _ = tournament.run_tournament(4, seed=0, max_steps=1)
+    assert number_dialogues == 6
+    assert all(agreement_rate == 0.0 for agreement_rate in agreement_rates.values())
+
+
+def test6():
+    # the model stops running once every dialogue ended
+    model = pw_argumentation.ArgumentModel(stats.list_items, seed=0, trace_sink=NullTraceSink())
+    steps = model.run_until_done(max_steps=100)
+    assert 0 < steps < 100 and not model.running
+    assert all(agent.is_done for agent in model.schedule.agents)
+    assert model.run_until_done() == 0
+
+    # but not before max_steps steps
+    model = pw_argumentation.ArgumentModel(stats.list_items, seed=0, trace_sink=NullTraceSink())
+    assert model.run_until_done(max_steps=1) == 1 and model.running
+    assert model.run_until_done() + 1 == steps and not model.running
+
+    # agents without session are idle, unless a message is waiting for them
+    model = pw_argumentation.ArgumentModel(
+        stats.list_items, seed=0, pairings=[], trace_sink=NullTraceSink()
+    )
+    assert model.run_until_done() == 1 and not model.running
+    model = pw_argumentation.ArgumentModel(
+        stats.list_items, seed=0, pairings=[], trace_sink=NullTraceSink()
+    )
+    model.get_message_service().set_instant_delivery(False)
+    A1, A2 = model.schedule.agents
+    A1.simple_send_message(2, MessagePerformative.PROPOSE, stats.list_items[0])
+    assert model.get_message_service().has_messages_to_proceed()
+    assert model.run_until_done(max_steps=1) == 1 and model.running
+    model.run_until_done()
+    assert not model.running
+    assert A1.sessions[2].is_done and A2.sessions[1].is_done
+
+    # the buffered trace is written once the model is done, stepping or in the event loop
+    for async_latency in (None, 0.0):
+        stream = io.StringIO()
+        model = pw_argumentation.ArgumentModel(
+            stats.list_items,
+            seed=0,
+            trace_sink=BufferedTextTraceSink(stream),
+            async_latency=async_latency,
+        )
+        if async_latency is None:
+            model.run_until_done()
+        else:
+            asyncio.run(model.run_async())
+        assert stream.getvalue().count("\n") == model.get_message_service().get_sent_count() > 0
+
+    # the binary trace can be read once the model is done, before the sink is closed
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "trace.bin")
+        binary_sink = BinaryTraceSink(path)
+        assert len(BinaryTraceReader(path)) == 0
+        model = pw_argumentation.ArgumentModel(stats.list_items, seed=0, trace_sink=binary_sink)
+        model.run_until_done()
+        reader = BinaryTraceReader(path)
+        records = reader.get_records()
+        assert len(reader) == model.get_message_service().get_sent_count() > 0
+        assert reader.get_performative(records[0]) == MessagePerformative.PROPOSE
+        item_names = {item.get_name() for item in stats.list_items}
+        assert reader.get_content(records[0])["name"] in item_names
+        del records, reader
+        model.get_message_service().close()
+
+
+def get_sweep_outcome(aggregator):
+    return (
+        aggregator.runs_done,
+        [list(counter.items()) for counter in aggregator.agreed_on],
+        [list(counter.items()) for counter in aggregator.commited_item_rank],
+        aggregator.confusion_matrix.tolist(),
+        aggregator.score_cache_hits,
+        aggregator.score_cache_misses,
+    )
+
+
+def test7():
+    # the outcome of a sweep does not depend on its processes and chunks
+    outcome = get_sweep_outcome(stats.run_sweep(30, seed=1))
+    assert outcome[0] == 30
+    for max_workers, chunk_size in ((1, 7), (2, 1), (2, 7), (3, 100)):
+        aggregator = stats.run_sweep(30, seed=1, max_workers=max_workers, chunk_size=chunk_size)
+        assert get_sweep_outcome(aggregator) == outcome
+
+
+def test8():
+    # a sweep interrupted after its first checkpoint resumes to the outcome of an uninterrupted one
+    outcome = get_sweep_outcome(stats.run_sweep(30, seed=1))
+    aggregate_chunk = stats.aggregate_chunk
+
+    def aggregate_chunk_until_interrupted(runs, *args):
+        if runs.start >= 20:
+            raise KeyboardInterrupt
+        return aggregate_chunk(runs, *args)
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint_path = os.path.join(directory, "checkpoint.json")
+        stats.aggregate_chunk = aggregate_chunk_until_interrupted
+        try:
+            stats.run_sweep(
+                30, seed=1, chunk_size=5, checkpoint_path=checkpoint_path, checkpoint_every=10
+            )
+            assert False, "the sweep must be interrupted"
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stats.aggregate_chunk = aggregate_chunk
+        checkpoint = stats.SweepAggregator.load(checkpoint_path)
+        assert checkpoint.runs_done == 20 and checkpoint.number_runs == 30
+
+        # the checkpoint only resumes the same sweep
+        for number_runs, seed in ((40, 1), (30, 2)):
+            try:
+                stats.run_sweep(number_runs, seed=seed, checkpoint_path=checkpoint_path)
+                assert False, "the checkpoint of another sweep must be rejected"
+            except ValueError:
+                pass
+
+        aggregator = stats.run_sweep(30, seed=1, checkpoint_path=checkpoint_path)
+        assert get_sweep_outcome(aggregator) == outcome
+        assert not os.path.exists(checkpoint_path)
+
+        checkpoint.runs_done = 31
+        checkpoint.save(checkpoint_path)
+        try:
+            stats.run_sweep(30, seed=1, checkpoint_path=checkpoint_path)
+            assert False, "a checkpoint with too many runs must be rejected"
+        except ValueError:
+            pass
+
+
+def get_best_items_by_scan(preferences, statuses, item_statuses, minimum_score=None):
+    candidates = [
+        item for item in preferences.get_item_ranking() if item_statuses[item] in statuses
+    ]
+    if not candidates:
+        return []
+    best_score = preferences.get_item_score(candidates[0])
+    if minimum_score is not None and best_score <= minimum_score:
+        return []
+    return [item for item in candidates if preferences.get_item_score(item) == best_score]
+
+
+def test9():
+    # the buckets of the statuses give the preferred items a scan of all the items gives
+    generator = random.Random(0)
+    items = [Item(f"Item {i}", "", None) for i in range(60)]
+    preferences = Preferences()
+    preferences.set_criterion_name_list([CriterionName.NOISE, CriterionName.DURABILITY])
+    for criterion_name in (CriterionName.NOISE, CriterionName.DURABILITY):
+        # few values, so that many items are equally preferred
+        preferences.add_criterion_values(
+            items, criterion_name, [generator.choice((0, 3, 4)) for _ in items]
+        )
+    statuses = ItemStatuses({item: None for item in items})
+    expected_statuses = {item: None for item in items}
+    status_sets = (
+        NOT_IMPOSSIBLE_STATUSES,
+        PROPOSABLE_STATUSES,
+        (Status.ACCEPTABLE_MINIMUM,),
+        (Status.IMPOSSIBLE,),
+    )
+    scores = sorted(set(preferences.get_scores().tolist()))
+    for change in range(300):
+        item = generator.choice(items)
+        # the statuses change (and come back) many times, leaving stale entries in the buckets
+        status = generator.choice((None, *Status))
+        statuses[item] = status
+        expected_statuses[item] = status
+        if change == 150:
+            # the buckets are rebuilt when the preferences change
+            preferences.set_criterion_name_list([CriterionName.DURABILITY, CriterionName.NOISE])
+            scores = sorted(set(preferences.get_scores().tolist()))
+        assert dict(statuses) == expected_statuses
+        assert item in statuses and Item("Other", "", None) not in statuses
+        for status_set in status_sets:
+            for minimum_score in (None, generator.choice(scores)):
+                assert statuses.get_best_items(
+                    preferences, status_set, minimum_score
+                ) == get_best_items_by_scan(
+                    preferences, status_set, expected_statuses, minimum_score
+                )
+            best_items = get_best_items_by_scan(preferences, status_set, expected_statuses)
+            assert statuses.get_best_score(preferences, status_set) == (
+                preferences.get_item_score(best_items[0]) if best_items else None
+            )
+
+
+def test10():
+    # a seed gives the same population of preferences
+    population = pw_argumentation.generate_population_preferences(stats.list_items, 4, seed=3)
+    same_population = pw_argumentation.generate_population_preferences(
+        stats.list_items, 4, seed=3
+    )
+    for preferences, same_preferences in zip(population, same_population):
+        assert preferences.get_items() == same_preferences.get_items()
+        assert preferences.get_criterion_name_list() == same_preferences.get_criterion_name_list()
+        assert np.array_equal(
+            preferences.get_value_matrix(), same_preferences.get_value_matrix()
+        )
+    other_population = pw_argumentation.generate_population_preferences(
+        stats.list_items, 4, seed=4
+    )
+    assert any(
+        preferences.get_criterion_name_list() != other_preferences.get_criterion_name_list()
+        or not np.array_equal(
+            preferences.get_value_matrix(), other_preferences.get_value_matrix()
+        )
+        for preferences, other_preferences in zip(population, other_population)
+    )
+
+    # the preferences of the agents are views into a single population matrix
+    value_matrices = [preferences.get_value_matrix() for preferences in population]
+    population_matrix = value_matrices[0].base
+    assert population_matrix.shape == (4, len(stats.list_items), len(CriterionName))
+    for agent, value_matrix in enumerate(value_matrices):
+        assert value_matrix.base is population_matrix
+        assert np.shares_memory(value_matrix, population_matrix[agent])
+
+
 class ArgumentModel(Model):
     """ArgumentModel which inherit from Model."""
 
     def __init__(self):
         self.schedule = BaseScheduler(self)
-        self.__messages_service = MessageService(self.schedule)
+        self.__messages_service = MessageService(
+            self.schedule, trace_sink=ConsoleTraceSink()
+        )
 
         self.running = True
 
@@ -223,6 +547,27 @@ if __name__ == "__main__":
     # From 1 to 2 (COMMIT) Electric Engine
     # From 2 to 1 (COMMIT) Electric Engine
 
+    test4()
+    # Expected result : no output, the dialogues of 3 agents end in their sessions
+
+    test5()
+    # Expected result : no output, the round robin and Swiss tournaments pair the agents
+
+    test6()
+    # Expected result : no output, the models run until their dialogues end
+
+    test7()
+    # Expected result : no output, the sweeps give the same outcome in parallel
+
+    test8()
+    # Expected result : no output, the interrupted sweep resumes from its checkpoint
+
+    test9()
+    # Expected result : no output, the item statuses find the preferred items of a status
+
+    test10()
+    # Expected result : no output, the population of preferences is reproducible
+
     test3()
     # Expected result :
     # From 1 to 2 (PROPOSE) A
@@ -0,0 +1,141 @@
+"""
+Tournaments between the agents of a single ArgumentModel: every agent argues with every other one
+(round robin), or with agents having made as many agreements as itself (Swiss system).
+All the dialogues are sessions of the same model, so its agents and message service are only set up
+once.
+
+Run with `python tournament.py`.
+"""
+
+import math
+import time
+
+from communication.message.TraceSink import NullTraceSink
+from pw_argumentation import ArgumentModel
+from stats import list_items
+
+
+def round_robin_pairings(agent_ids: list[int]) -> list[tuple[int, int]]:
+    """Returns a pairing of every agent with every other one."""
+    return [
+        (agent_id, partner_id)
+        for i, agent_id in enumerate(agent_ids)
+        for partner_id in agent_ids[i + 1 :]
+    ]
+
+
+def swiss_pairings(
+    agent_ids: list[int], points: dict[int, int], played: set[frozenset[int]]
+) -> list[tuple[int, int]]:
+    """Returns the pairings of a Swiss round: the agents are ranked by points (then by id), and each
+    one is paired with the next unpaired agent it has not argued with yet. An agent may stay
+    unpaired."""
+    ranked_ids = sorted(agent_ids, key=lambda agent_id: (-points[agent_id], agent_id))
+    pairings = []
+    paired_ids = set()
+    for i, agent_id in enumerate(ranked_ids):
+        if agent_id in paired_ids:
+            continue
+        for partner_id in ranked_ids[i + 1 :]:
+            if partner_id not in paired_ids and frozenset((agent_id, partner_id)) not in played:
+                pairings.append((agent_id, partner_id))
+                paired_ids.update((agent_id, partner_id))
+                break
+    return pairings
+
+
+def play(model: ArgumentModel, pairings: list[tuple[int, int]], max_steps: int) -> int:
+    """Opens a session for each pairing and steps the model until they are all done, or max_steps
+    steps are made: the sessions which are not done are then aborted, without agreement.
+    Returns the number of steps."""
+    find_agent_from_id = model.get_message_service().find_agent_from_id
+    for agent_id, partner_id in pairings:
+        model.open_session(agent_id, partner_id)
+    agents = [
+        find_agent_from_id(agent_id)
+        for agent_id in {agent_id for pairing in pairings for agent_id in pairing}
+    ]
+    steps = 0
+    while steps < max_steps and not all(agent.is_done for agent in agents):
+        model.step()
+        steps += 1
+    for agent_id, partner_id in pairings:
+        find_agent_from_id(agent_id).abort_session(partner_id)
+        find_agent_from_id(partner_id).abort_session(agent_id)
+    return steps
+
+
+def get_agreement(model: ArgumentModel, agent_id: int, partner_id: int) -> bool:
+    """Returns whether two agents committed on the same item in their session."""
+    find_agent_from_id = model.get_message_service().find_agent_from_id
+    session = find_agent_from_id(agent_id).sessions[partner_id]
+    partner_session = find_agent_from_id(partner_id).sessions[agent_id]
+    return (
+        session.is_done
+        and partner_session.is_done
+        and session.committed_item is not None
+        and session.committed_item is partner_session.committed_item
+    )
+
+
+def run_tournament(
+    n_agents: int,
+    list_items=list_items,
+    system="round_robin",
+    number_rounds=None,
+    seed=None,
+    max_steps=1000,
+):
+    """Runs a tournament between n_agents agents, in a round robin or a Swiss system (of
+    number_rounds rounds, log2(n_agents) rounded up by default).
+    Returns the agreement rate of each agent (by id), the number of dialogues and the number of
+    dialogues per second.
+    """
+    start = time.perf_counter()
+    model = ArgumentModel(
+        list_items,
+        seed=seed,
+        n_agents=n_agents,
+        pairings=[],
+        trace_sink=NullTraceSink(),
+        event_driven=True,
+    )
+    agent_ids = [agent.unique_id for agent in model.schedule.agents]
+    agreements = {agent_id: 0 for agent_id in agent_ids}
+    dialogues = {agent_id: 0 for agent_id in agent_ids}
+    played = set()
+
+    if system == "round_robin":
+        rounds = [round_robin_pairings(agent_ids)]
+    elif system == "swiss":
+        rounds = range(number_rounds or max(1, math.ceil(math.log2(n_agents))))
+    else:
+        raise ValueError(f"Unknown tournament system {system}")
+
+    for pairings in rounds:
+        if system == "swiss":
+            pairings = swiss_pairings(agent_ids, agreements, played)
+        play(model, pairings, max_steps)
+        for agent_id, partner_id in pairings:
+            played.add(frozenset((agent_id, partner_id)))
+            agreed = get_agreement(model, agent_id, partner_id)
+            for pairing_agent_id in (agent_id, partner_id):
+                dialogues[pairing_agent_id] += 1
+                agreements[pairing_agent_id] += agreed
+
+    elapsed = time.perf_counter() - start
+    agreement_rates = {
+        agent_id: agreements[agent_id] / dialogues[agent_id] if dialogues[agent_id] else 0.0
+        for agent_id in agent_ids
+    }
+    return agreement_rates, len(played), len(played) / elapsed
+
+
+if __name__ == "__main__":
+    for system in ("round_robin", "swiss"):
+        agreement_rates, number_dialogues, dialogues_per_second = run_tournament(
+            50, system=system, seed=0
+        )
+        print(f"\n{system} : {number_dialogues} dialogues, {dialogues_per_second:.0f} dialogues/s")
+        for agent_id, agreement_rate in agreement_rates.items():
+            print(f"A{agent_id} : {agreement_rate:.0%} agreements")